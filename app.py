@@ -1,175 +1,235 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import datetime
-import sqlite3
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-import io
-import uuid
 import os
 import logging
+import logging.handlers
+import queue
+import atexit
 from dotenv import load_dotenv
 import json
+import hmac
+
+import metrics
+from maintenance import attached_partitions
+from catalog import FoodCatalog, NUTRIENTS
+from downsample import downsample
+from data import food_data, meal_templates, meal_minimums, DRI
+from db import (ConnectionPool, ITEM_COLUMNS, fetch_last_log_id, fetch_log_dates, fetch_meal_log_items, fetch_period_totals,
+                fetch_shared_plan, insert_meal_log, insert_shared_plan, record_shared_plan_view)
+from exports import ExportCache, content_key, logs_csv, logs_pdf, plan_csv, plan_pdf
+from nutrition import evaluate, plan_totals, selection_frame
+from optimizer import candidate_ids, default_limits, plan_day, tag_penalty
+from search import SearchIndex
+from selection import Selection
+from sharing import canonical_json, parse_foods, plan_items, share_id
+from substitutions import SubstitutionIndex
+from writer import shared_writer
+
+LOG_HANDLER = "mealplan-queue"
+
+def install_log_listener():
+    # Log records are queued by the script threads and written to the file by a listener
+    # thread. The root logger outlives Streamlit's caches, so this runs once per process
+    # even when init_process runs again after a cache clear.
+    root = logging.getLogger()
+    if any(handler.get_name() == LOG_HANDLER for handler in root.handlers):
+        return
+    os.makedirs('logs', exist_ok=True)
+    file_handler = logging.FileHandler('logs/app.log', encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.set_name(LOG_HANDLER)
+    root.setLevel(logging.INFO)
+    root.addHandler(queue_handler)
+
+# One-time process setup: logging and environment variables. The heavy libraries are
+# imported inside the functions that use them, so they stay off the startup path:
+# Plotly and ReportLab (with the PDF font) when a chart or PDF is built, SciPy when a
+# plan is optimized or swaps are suggested (the CLI's transfer module defers PyArrow too).
+@st.cache_resource(show_spinner=False)
+def init_process():
+    install_log_listener()
+    load_dotenv()
+    # Timing metrics, off unless METRICS_ENABLED is set; METRICS_FILE gets Prometheus text
+    metrics.configure(os.getenv('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes'))
+    if metrics.enabled() and os.getenv('METRICS_FILE'):
+        metrics.start_exporter(os.getenv('METRICS_FILE'), float(os.getenv('METRICS_INTERVAL', '15')))
+    return {
+        "db_path": os.getenv('DB_PATH', 'meal_logs.db'),
+        "admin_token": os.getenv('ADMIN_TOKEN'),
+        "app_url": os.getenv('APP_URL', 'http://localhost:8501').rstrip('/'),
+        "partition_dir": os.getenv('PARTITION_DIR')
+    }
 
-# Configure logging
-os.makedirs('logs', exist_ok=True)
-logging.basicConfig(
-    filename='logs/app.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+config = init_process()
 logger = logging.getLogger(__name__)
+DB_PATH = config["db_path"]
 
-# Load environment variables
-load_dotenv()
-DB_PATH = os.getenv('DB_PATH', 'meal_logs.db')
+# SQLite connection pool, created (and the schema migrated) once per process
+@st.cache_resource(show_spinner=False)
+def get_pool():
+    return ConnectionPool(DB_PATH)
 
-# Register Arabic font for PDF
 try:
-    pdfmetrics.registerFont(TTFont('NotoSansArabic', 'NotoSansArabic-Regular.ttf'))
+    pool = get_pool()
 except Exception as e:
-    logger.error(f"Failed to load font: {e}")
-    st.error("خطأ في تحميل الخط العربي. تأكد من وجود ملف NotoSansArabic-Regular.ttf.")
-
-# Simulated nutritional data
-food_data = {
-    "البروتينات": [
-        ("صدر دجاج مشوي", ["بروتين عالي", "فوسفور منخفض"], {"protein": 31, "potassium": 220, "phosphorus": 210, "calories": 165}),
-        ("بياض البيض", ["بروتين عالي", "بوتاسيوم منخفض"], {"protein": 3.6, "potassium": 54, "phosphorus": 15, "calories": 17}),
-        ("سمك التونة المعلب", ["بروتين عالي"], {"protein": 26, "potassium": 200, "phosphorus": 180, "calories": 120}),
-        ("سردين", ["بروتين عالي"], {"protein": 25, "potassium": 397, "phosphorus": 490, "calories": 208}),
-        ("لحم بقر طازج", ["بروتين عالي"], {"protein": 26, "potassium": 318, "phosphorus": 200, "calories": 250}),
-        ("أسماك أخرى طازجة", ["بروتين عالي"], {"protein": 22, "potassium": 350, "phosphorus": 250, "calories": 140}),
-    ],
-    "خضروات منخفضة البوتاسيوم": [
-        ("خس", ["بوتاسيوم منخفض"], {"protein": 1.4, "potassium": 194, "phosphorus": 20, "calories": 15}),
-        ("خيار", ["بوتاسيوم منخفض"], {"protein": 0.7, "potassium": 147, "phosphorus": 24, "calories": 16}),
-        ("بصل", ["بوتاسيوم منخفض"], {"protein": 1.1, "potassium": 146, "phosphorus": 29, "calories": 40}),
-        ("باذنجان", ["بوتاسيوم منخفض"], {"protein": 1, "potassium": 229, "phosphorus": 24, "calories": 25}),
-        ("فلفل رومي", ["بوتاسيوم منخفض"], {"protein": 1, "potassium": 211, "phosphorus": 26, "calories": 31}),
-        ("قرنبيط", ["بوتاسيوم منخفض"], {"protein": 1.9, "potassium": 299, "phosphorus": 44, "calories": 25}),
-        ("ملفوف", ["بوتاسيوم منخفض"], {"protein": 1.3, "potassium": 170, "phosphorus": 26, "calories": 25}),
-        ("كرفس", ["بوتاسيوم منخفض"], {"protein": 0.7, "potassium": 260, "phosphorus": 24, "calories": 16}),
-    ],
-    "فواكه منخفضة البوتاسيوم": [
-        ("تفاح", ["بوتاسيوم منخفض"], {"protein": 0.3, "potassium": 107, "phosphorus": 11, "calories": 52}),
-        ("توت", ["بوتاسيوم منخفض"], {"protein": 1.4, "potassium": 77, "phosphorus": 22, "calories": 57}),
-        ("عنب", ["بوتاسيوم منخفض"], {"protein": 0.7, "potassium": 191, "phosphorus": 20, "calories": 69}),
-        ("أناناس", ["بوتاسيوم منخفض"], {"protein": 0.5, "potassium": 109, "phosphorus": 8, "calories": 50}),
-        ("برقوق", ["بوتاسيوم منخفض"], {"protein": 0.7, "potassium": 157, "phosphorus": 16, "calories": 46}),
-        ("شمام", ["بوتاسيوم منخفض"], {"protein": 0.8, "potassium": 267, "phosphorus": 15, "calories": 34}),
-    ],
-    "الكربوهيدرات والحبوب": [
-        ("خبز أبيض", ["فوسفور منخفض"], {"protein": 3.2, "potassium": 115, "phosphorus": 99, "calories": 77}),
-        ("أرز أبيض", ["فوسفور منخفض"], {"protein": 2.7, "potassium": 35, "phosphorus": 43, "calories": 130}),
-        ("مكرونة", ["فوسفور منخفض"], {"protein": 5, "potassium": 44, "phosphorus": 58, "calories": 131}),
-        ("مقرمشات الذرة", ["فوسفور منخفض"], {"protein": 1, "potassium": 36, "phosphorus": 30, "calories": 110}),
-        ("رقائق التورتيلا غير مملحة", ["صوديوم منخفض"], {"protein": 2, "potassium": 100, "phosphorus": 140, "calories": 140}),
-    ],
-    "معززات النكهة": [
-        ("ليمون", ["صوديوم منخفض"], {"protein": 1.1, "potassium": 138, "phosphorus": 16, "calories": 29}),
-        ("ثوم", ["صوديوم منخفض"], {"protein": 6.4, "potassium": 401, "phosphorus": 153, "calories": 149}),
-        ("بصل", ["صوديوم منخفض"], {"protein": 1.1, "potassium": 146, "phosphorus": 29, "calories": 40}),
-        ("كزبرة", ["صوديوم منخفض"], {"protein": 2.1, "potassium": 521, "phosphorus": 48, "calories": 23}),
-        ("شبت", ["صوديوم منخفض"], {"protein": 3.5, "potassium": 738, "phosphorus": 66, "calories": 43}),
-        ("زعتر", ["صوديوم منخفض"], {"protein": 5.6, "potassium": 609, "phosphorus": 106, "calories": 101}),
-        ("إكليل الجبل", ["صوديوم منخفض"], {"protein": 3.3, "potassium": 668, "phosphorus": 66, "calories": 131}),
-    ]
+    pool = None
+    logger.error(f"Database setup failed: {e}")
+    st.error("خطأ في إعداد قاعدة البيانات. تحقق من مسار قاعدة البيانات.")
+
+# Background writer: saves and shares are committed in grouped transactions off the
+# script thread, and flushed when the process exits. A writer created after a cache
+# clear closes (and flushes) the one it replaces.
+@st.cache_resource(show_spinner=False)
+def get_writer():
+    return shared_writer(pool)
+
+writer = get_writer() if pool is not None else None
+
+# Food catalog, built once per process and shared by all sessions
+@st.cache_resource(show_spinner=False)
+def get_catalog():
+    return FoodCatalog.from_food_data(food_data)
+
+catalog = get_catalog()
+
+# Search index over the catalog's food names, shared by all sessions
+@st.cache_resource(show_spinner=False)
+def get_search_index():
+    return SearchIndex(catalog.names)
+
+search_index = get_search_index()
+
+# Rank of each matching food by query, so fragment reruns don't search again
+@st.cache_resource(max_entries=256, show_spinner=False)
+def search_ranks(query):
+    return {food_id: r for r, food_id in enumerate(search_index.search(query))}
+
+# Same-category substitution trees, built on the first plan that needs a swap
+@st.cache_resource(show_spinner=False)
+def get_substitutions():
+    return SubstitutionIndex(catalog, DRI)
+
+# Tracking periods and the rollup bucket their summary and trend are shown at
+PERIOD_BUCKETS = {
+    "يومي": "day",
+    "أسبوعي": "day",
+    "شهري": "day",
+    "ربع سنوي": "week",
+    "سنوي": "month"
 }
 
-# Meal plan templates
-meal_templates = {
-    "يوم غسيل الكلى القياسي": {
-        "الإفطار": [
-            {"food": "بياض البيض", "category": "البروتينات", "portion": 100},
-            {"food": "خبز أبيض", "category": "الكربوهيدرات والحبوب", "portion": 50},
-            {"food": "تفاح", "category": "فواكه منخفضة البوتاسيوم", "portion": 100}
-        ],
-        "الغداء": [
-            {"food": "صدر دجاج مشوي", "category": "البروتينات", "portion": 100},
-            {"food": "أرز أبيض", "category": "الكربوهيدرات والحبوب", "portion": 100},
-            {"food": "خس", "category": "خضروات منخفضة البوتاسيوم", "portion": 50}
-        ],
-        "العشاء": [
-            {"food": "سمك التونة المعلب", "category": "البروتينات", "portion": 100},
-            {"food": "ملفوف", "category": "خضروات منخفضة البوتاسيوم", "portion": 50},
-            {"food": "ليمون", "category": "معززات النكهة", "portion": 10}
-        ]
-    },
-    "يوم منخفض السعرات": {
-        "الإفطار": [
-            {"food": "بياض البيض", "category": "البروتينات", "portion": 50},
-            {"food": "توت", "category": "فواكه منخفضة البوتاسيوم", "portion": 100}
-        ],
-        "الغداء": [
-            {"food": "صدر دجاج مشوي", "category": "البروتينات", "portion": 80},
-            {"food": "خيار", "category": "خضروات منخفضة البوتاسيوم", "portion": 100}
-        ],
-        "العشاء": [
-            {"food": "سمك التونة المعلب", "category": "البروتينات", "portion": 80},
-            {"food": "قرنبيط", "category": "خضروات منخفضة البوتاسيوم", "portion": 50}
-        ]
-    },
-    "يوم عالي البروتين": {
-        "الإفطار": [
-            {"food": "بياض البيض", "category": "البروتينات", "portion": 150},
-            {"food": "خبز أبيض", "category": "الكربوهيدرات والحبوب", "portion": 50}
-        ],
-        "الغداء": [
-            {"food": "صدر دجاج مشوي", "category": "البروتينات", "portion": 150},
-            {"food": "أرز أبيض", "category": "الكربوهيدرات والحبوب", "portion": 100},
-            {"food": "فلفل رومي", "category": "خضروات منخفضة البوتاسيوم", "portion": 50}
-        ],
-        "العشاء": [
-            {"food": "لحم بقر طازج", "category": "البروتينات", "portion": 100},
-            {"food": "ملفوف", "category": "خضروات منخفضة البوتاسيوم", "portion": 50}
-        ]
-    }
+def period_bounds(period, selected_date):
+    if period == "يومي":
+        return selected_date, selected_date
+    if period == "أسبوعي":
+        start_date = selected_date - datetime.timedelta(days=selected_date.weekday())
+        return start_date, start_date + datetime.timedelta(days=6)
+    if period == "شهري":
+        start_date = selected_date.replace(day=1)
+        months = 1
+    elif period == "ربع سنوي":
+        start_date = selected_date.replace(month=(selected_date.month - 1) // 3 * 3 + 1, day=1)
+        months = 3
+    else:  # سنوي
+        start_date = selected_date.replace(month=1, day=1)
+        months = 12
+    month_index = start_date.month - 1 + months
+    next_start = start_date.replace(year=start_date.year + month_index // 12, month=month_index % 12 + 1)
+    return start_date, next_start - datetime.timedelta(days=1)
+
+# Built exports, shared by all sessions and keyed by content hash
+@st.cache_resource(show_spinner=False)
+def get_export_cache():
+    return ExportCache()
+
+export_cache = get_export_cache()
+
+def lazy_download(name, prepare_label, label, key, build, file_name, mime):
+    """Download button whose file is only built once asked for, then served from the export cache."""
+    data = export_cache.get(key)
+    if data is None:
+        if not st.button(prepare_label, key=f"prepare_{name}"):
+            return
+        with metrics.span(f"export.{name}"):
+            data = export_cache.get_or_build(key, build)
+    st.download_button(label, data, file_name, mime, key=f"download_{name}")
+
+# Food table columns and their display names
+FOOD_COLUMNS = {
+    "food": "الطعام",
+    "category": "الفئة",
+    "portion": "الكمية (100 جم)",
+    "protein": "البروتين (جم)",
+    "potassium": "البوتاسيوم (ملجم)",
+    "phosphorus": "الفوسفور (ملجم)",
+    "calories": "السعرات (كيلو كالوري)"
 }
 
-# Recommended daily intake for dialysis patients
-DRI = {
-    "protein": 60,  # g
-    "potassium": 2000,  # mg
-    "phosphorus": 800,  # mg
-    "calories": 2000  # kcal
+def food_table(frame):
+    return frame[list(FOOD_COLUMNS)].rename(columns=FOOD_COLUMNS)
+
+# Frame, display table and evaluation of a selection, memoized by its contents: reruns
+# reuse them until the selection changes, and sessions with the same selection (such as
+# an unmodified template) share one copy
+SELECTION_VIEWS = 256
+
+@st.cache_resource(max_entries=SELECTION_VIEWS, show_spinner=False)
+def selection_view(key, _selection):
+    ids, portions = _selection.arrays()
+    frame = selection_frame(catalog, ids, portions)
+    return frame, food_table(frame), evaluate(plan_totals(catalog, ids, portions), DRI)
+
+def nutrient_pie(totals):
+    total_protein, total_potassium, total_phosphorus, total_calories = totals
+    nutrient_data = pd.DataFrame({
+        "العنصر": ["البروتين", "البوتاسيوم", "الفوسفور", "السعرات"],
+        "القيمة": [total_protein, total_potassium / 100, total_phosphorus / 100, total_calories / 100]
+    })
+    import plotly.express as px
+    return px.pie(nutrient_data, values='القيمة', names='العنصر', title='توزيع العناصر الغذائية')
+
+# Nutrient recommendations, shown when a nutrient is below/above its DRI threshold
+# and no food swap brings the plan closer to it
+RECOMMENDATIONS = {
+    "protein": "زيادة تناول البروتين! جرب إضافة صدر دجاج مشوي أو بياض البيض.",
+    "potassium": "تقليل البوتاسيوم! تجنب أطعمة مثل ثوم أو شبت، واختر خس أو خيار.",
+    "phosphorus": "تقليل الفوسفور! قلل من أطعمة مثل سردين، واختر خبز أبيض.",
+    "calories": "زيادة السعرات! أضف أرز أبيض أو مكرونة إلى وجباتك."
 }
 
-# SQLite database setup
-try:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS meal_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT DEFAULT 'guest',
-            date TEXT,
-            foods TEXT,
-            protein REAL,
-            potassium REAL,
-            phosphorus REAL,
-            calories REAL
-        )
-    ''')
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS shared_plans (
-            id TEXT PRIMARY KEY,
-            user_id TEXT DEFAULT 'guest',
-            foods TEXT,
-            created_at TEXT
-        )
-    ''')
-    conn.commit()
-except Exception as e:
-    logger.error(f"Database setup failed: {e}")
-    st.error("خطأ في إعداد قاعدة البيانات. تحقق من مسار قاعدة البيانات.")
+# Warnings, shown when a nutrient exceeds its DRI, naming the selected food contributing most
+WARNINGS = {
+    "protein": "تحذير: تجاوزت كمية البروتين الحد اليومي! قلل من أطعمة مثل {food}.",
+    "potassium": "تحذير: تجاوزت كمية البوتاسيوم الحد اليومي! تجنب أطعمة مثل {food}.",
+    "phosphorus": "تحذير: تجاوزت كمية الفوسفور الحد اليومي! قلل من أطعمة مثل {food}."
+}
+
+# Initialize session state: the selection holds catalog ids and portions (g) as typed arrays
+if 'selection' not in st.session_state:
+    st.session_state.selection = Selection()
+# Queued writes awaiting commit: (future, success message, error message)
+if 'pending_writes' not in st.session_state:
+    st.session_state.pending_writes = []
 
-# Initialize session state
-if 'selected_foods' not in st.session_state:
-    st.session_state.selected_foods = []
+def add_food(food_id, portion):
+    st.session_state.selection.add(food_id, portion)
+
+def clear_selection():
+    st.session_state.selection.clear()
+
+def load_plan(plan):
+    """Replace the selection with a template-shaped plan: {meal: [{"food", "category", "portion"}]}."""
+    clear_selection()
+    for meal, foods in plan.items():
+        ids, portions = catalog.resolve(foods)
+        for food_id, portion in zip(ids, portions):
+            add_food(food_id, portion)
 
 # Main app
 st.set_page_config(page_title="قائمة الأطعمة لمرضى غسيل الكلى", layout="wide")
@@ -199,51 +259,191 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Hidden performance dashboard, opened with ?admin=<ADMIN_TOKEN>
+def is_admin():
+    token = config["admin_token"]
+    given = st.query_params.get("admin")
+    return bool(token and given) and hmac.compare_digest(given.encode(), token.encode())
+
+def performance_dashboard():
+    st.title("لوحة الأداء")
+    if not metrics.enabled():
+        st.info("القياسات غير مفعلة. عيّن METRICS_ENABLED=1 لتفعيلها.")
+        return
+    rows = metrics.summary()
+    if not rows:
+        st.info("لا توجد قياسات بعد.")
+    else:
+        st.dataframe(pd.DataFrame(rows).rename(columns={
+            "kind": "النوع",
+            "name": "القسم",
+            "count": "العدد",
+            "mean_ms": "المتوسط (ms)",
+            "p50_ms": "p50 (ms)",
+            "p95_ms": "p95 (ms)",
+            "p99_ms": "p99 (ms)",
+            "max_ms": "الأقصى (ms)"
+        }), use_container_width=True)
+    st.download_button("تنزيل القياسات بصيغة Prometheus", metrics.prometheus_text(), "metrics.prom", "text/plain")
+    if st.button("إعادة ضبط القياسات"):
+        metrics.reset()
+        logger.info("Admin reset performance metrics")
+        st.rerun()
+
+if is_admin():
+    performance_dashboard()
+    st.stop()
+
+# Shared plan viewer, opened with ?share=<id>. Rendered plans are kept in an LRU of
+# SHARED_VIEWS entries, so popular links skip SQLite and chart building. Expiry runs in
+# the maintenance process, so an expired plan is still served until its entry's
+# SHARED_VIEW_TTL seconds are up.
+SHARED_VIEWS = 256
+SHARED_VIEW_TTL = 3600
+
+@st.cache_resource(max_entries=SHARED_VIEWS, ttl=SHARED_VIEW_TTL, show_spinner=False)
+def shared_plan_view(plan_id):
+    with pool.connection() as conn:
+        foods = fetch_shared_plan(conn, plan_id)
+    if foods is None:
+        # Raised rather than returned so unknown ids are not cached
+        raise KeyError(plan_id)
+    items = parse_foods(foods)
+    ids, portions = catalog.resolve(items)
+    evaluation = evaluate(plan_totals(catalog, ids, portions), DRI)
+    return {
+        "items": items,
+        "table": food_table(selection_frame(catalog, ids, portions)),
+        "evaluation": evaluation,
+        "figure": nutrient_pie(evaluation.totals.tolist())
+    }
+
+# Views keep a plan from expiring. They are recorded through the writer, once per plan and
+# day in each process: the cached Future marks the day as done.
+@st.cache_resource(max_entries=SHARED_VIEWS, show_spinner=False)
+def record_view(plan_id, day):
+    return writer.submit(record_shared_plan_view, plan_id, day)
+
+def shared_plan_page(plan_id):
+    st.title("خطة غذائية مشتركة")
+    try:
+        view = shared_plan_view(plan_id)
+    except KeyError:
+        st.error("لم يتم العثور على الخطة المشتركة.")
+        return
+    except Exception as e:
+        logger.error(f"Shared plan {plan_id} failed to load: {e}")
+        st.error("خطأ في تحميل الخطة المشتركة.")
+        return
+    if writer is not None:
+        record_view(plan_id, datetime.date.today().isoformat())
+    evaluation = view["evaluation"]
+    cols = st.columns(4)
+    for col, label, unit, total, percent in zip(
+        cols, ["البروتين", "البوتاسيوم", "الفوسفور", "السعرات"], ["جم", "ملجم", "ملجم", "كيلو كالوري"],
+        evaluation.totals.tolist(), evaluation.percent.tolist()
+    ):
+        col.metric(label, f"{total:.1f} {unit}", f"{percent:.1f}% من الحد اليومي")
+    st.dataframe(view["table"])
+    st.plotly_chart(view["figure"], use_container_width=True)
+    if st.button("استخدام هذه الخطة"):
+        load_plan({"": view["items"]})
+        logger.info(f"Guest user loaded shared plan {plan_id}")
+        st.query_params.clear()
+        st.session_state.flash = "تم تحميل الخطة المشتركة!"
+        st.rerun()
+
+if "share" in st.query_params:
+    shared_plan_page(st.query_params["share"])
+    st.stop()
+
 # Sidebar for filters
 with st.sidebar:
     st.header("🔍 خيارات التصفية")
-    all_tags = sorted(set(tag for items in food_data.values() for _, tags, _ in items for tag in tags))
-    selected_tags = st.multiselect("فلترة حسب الخصائص الغذائية:", all_tags, help="اختر الخصائص المناسبة لنظامك الغذائي")
+    selected_tags = st.multiselect("فلترة حسب الخصائص الغذائية:", catalog.all_tags, help="اختر الخصائص المناسبة لنظامك الغذائي")
     search_query = st.text_input("ابحث عن طعام:", placeholder="أدخل اسم الطعام (مثل: تفاح، دجاج)")
 
-# Tabs for workflow
-tab1, tab2, tab3 = st.tabs(["اختيار الأطعمة", "خطة النظام الغذائي", "تتبع الوجبات"])
-
-with tab1:
-    st.header("اختيار الأطعمة")
+# Each section below is a fragment, so interacting with its widgets reruns only that
+# section. Streamlit can rerun either the current fragment or the whole app, and the
+# selection table and plan summary are separate fragments, so changing the selection
+# triggers one full rerun.
+def selection_changed(message=None):
+    if message:
+        st.session_state.flash = message
+    st.rerun()
+
+# Polls the session's queued writes; once one has committed or failed, reruns the app
+# so its message shows and the tracker includes it
+@st.fragment(run_every=0.5)
+def write_status():
+    pending = st.session_state.pending_writes
+    done = [entry for entry in pending if entry[0].done()]
+    if not done:
+        if pending:
+            st.caption("جارٍ الحفظ...")
+        return
+    for entry in done:
+        pending.remove(entry)
+        future, success, failure = entry
+        if future.exception() is None:
+            st.session_state.flash = success
+        else:
+            logger.error(f"Queued write failed: {future.exception()}")
+            st.session_state.flash_error = failure
+    st.rerun()
+
+@st.fragment
+def food_picker(selected_tags, search_query):
     # Meal plan template selection
     st.subheader("تحميل نموذج خطة وجبات")
     template_name = st.selectbox("اختر نموذج خطة وجبات:", ["لا شيء"] + list(meal_templates.keys()))
     if template_name != "لا شيء" and st.button("تحميل النموذج"):
-        st.session_state.selected_foods = []
         try:
-            for meal, foods in meal_templates[template_name].items():
-                for item in foods:
-                    for cat, cat_items in food_data.items():
-                        for food, tags, nutrients in cat_items:
-                            if food == item["food"] and cat == item["category"]:
-                                food_info = {
-                                    "food": food,
-                                    "category": cat,
-                                    "portion": item["portion"] / 100,
-                                    "protein": nutrients["protein"] * (item["portion"] / 100),
-                                    "potassium": nutrients["potassium"] * (item["portion"] / 100),
-                                    "phosphorus": nutrients["phosphorus"] * (item["portion"] / 100),
-                                    "calories": nutrients["calories"] * (item["portion"] / 100),
-                                    "tags": tags
-                                }
-                                st.session_state.selected_foods.append(food_info)
+            load_plan(meal_templates[template_name])
             logger.info(f"Guest user loaded template {template_name}")
-            st.success(f"تم تحميل نموذج {template_name}!")
+            selection_changed(f"تم تحميل نموذج {template_name}!")
         except Exception as e:
             logger.error(f"Template loading failed: {e}")
             st.error("خطأ في تحميل النموذج.")
 
-    # Manual food selection
-    for category, items in food_data.items():
-        with st.expander(f"{category}", expanded=True):
-            for food, tags, nutrients in items:
-                if (not selected_tags or all(tag in tags for tag in selected_tags)) and (not search_query or search_query.lower() in food.lower()):
+    # Optimized meal plan within the patient's limits
+    st.subheader("إنشاء خطة وجبات مثالية")
+    with st.expander("حدود المريض"):
+        limit_cols = st.columns(4)
+        defaults = default_limits(DRI)
+        protein_min = limit_cols[0].number_input("الحد الأدنى للبروتين (جم)", min_value=0.0, value=float(defaults.protein_min), step=5.0)
+        potassium_max = limit_cols[1].number_input("الحد الأقصى للبوتاسيوم (ملجم)", min_value=0.0, value=float(defaults.potassium_max), step=100.0)
+        phosphorus_max = limit_cols[2].number_input("الحد الأقصى للفوسفور (ملجم)", min_value=0.0, value=float(defaults.phosphorus_max), step=50.0)
+        calories_target = limit_cols[3].number_input("السعرات المستهدفة (كيلو كالوري)", min_value=0.0, value=float(defaults.calories_target), step=100.0)
+    if st.button("إنشاء الخطة"):
+        try:
+            limits = defaults._replace(protein_min=protein_min, potassium_max=potassium_max,
+                                       phosphorus_max=phosphorus_max, calories_target=calories_target,
+                                       protein_max=max(defaults.protein_max, protein_min))
+            # Selected tags are preferred, not required: few foods carry any one tag
+            ids = candidate_ids(catalog)
+            plan = plan_day(catalog, limits, ids, category_min=meal_minimums,
+                            penalty=tag_penalty(catalog, ids, limits, selected_tags))
+        except Exception as e:
+            plan = None
+            logger.error(f"Meal plan optimization failed: {e}")
+        if plan is None:
+            st.error("تعذر إنشاء خطة تحقق الحدود المحددة. جرب تعديل الحدود أو خيارات التصفية.")
+        else:
+            load_plan(plan)
+            logger.info("Guest user generated an optimized meal plan")
+            selection_changed("تم إنشاء خطة وجبات مثالية!")
+
+    # Manual food selection, best search matches first
+    with metrics.span("tab1.food_list"):
+        rank = search_ranks(search_query) if search_query else None
+        for category in catalog.category_ids:
+            with st.expander(f"{category}", expanded=True):
+                food_ids = catalog.filter(selected_tags, category)
+                if rank is not None:
+                    food_ids = sorted((i for i in food_ids if i in rank), key=rank.get)
+                for food_id in food_ids:
+                    food, tags = catalog.names[food_id], catalog.tags[food_id]
                     col1, col2, col3 = st.columns([3, 1, 1])
                     with col1:
                         st.markdown(f"**{food}** — _{'، '.join(tags)}_")
@@ -258,261 +458,272 @@ with tab1:
                             if portion <= 0:
                                 st.error("يرجى إدخال كمية صالحة (أكبر من 0).")
                             else:
-                                food_info = {
-                                    "food": food,
-                                    "category": category,
-                                    "portion": portion / 100,
-                                    "protein": nutrients["protein"] * (portion / 100),
-                                    "potassium": nutrients["potassium"] * (portion / 100),
-                                    "phosphorus": nutrients["phosphorus"] * (portion / 100),
-                                    "calories": nutrients["calories"] * (portion / 100),
-                                    "tags": tags
-                                }
-                                st.session_state.selected_foods.append(food_info)
+                                add_food(food_id, portion)
                                 logger.info(f"Guest user added food {food}")
-                                st.success(f"تمت إضافة {food}")
+                                selection_changed(f"تمت إضافة {food}")
 
+@st.fragment
+def selected_foods_table():
     # Display selected foods
-    if st.session_state.selected_foods:
+    selection = st.session_state.selection
+    if selection:
         st.subheader("الأطعمة المختارة")
-        df_selected = pd.DataFrame(st.session_state.selected_foods)
-        st.dataframe(df_selected[["food", "category", "portion", "protein", "potassium", "phosphorus", "calories"]].rename(columns={
-            "food": "الطعام",
-            "category": "الفئة",
-            "portion": "الكمية (100 جم)",
-            "protein": "البروتين (جم)",
-            "potassium": "البوتاسيوم (ملجم)",
-            "phosphorus": "الفوسفور (ملجم)",
-            "calories": "السعرات (كيلو كالوري)"
-        }))
+        _, table, _ = selection_view(selection.key(), selection)
+        st.dataframe(table)
 
         # Remove selected foods
-        for food in st.session_state.selected_foods:
-            if st.button(f"إزالة {food['food']}", key=f"remove_{food['food']}_{food['category']}"):
-                st.session_state.selected_foods = [f for f in st.session_state.selected_foods if f['food'] != food['food'] or f['category'] != food['category']]
-                logger.info(f"Guest user removed food {food['food']}")
-                st.rerun()
-
-with tab2:
-    st.header("خطة النظام الغذائي")
-    if not st.session_state.selected_foods:
+        for food_id in dict.fromkeys(selection.ids):
+            food, category = catalog.names[food_id], catalog.categories[food_id]
+            if st.button(f"إزالة {food}", key=f"remove_{food}_{category}"):
+                selection.remove(food_id)
+                logger.info(f"Guest user removed food {food}")
+                selection_changed()
+
+@st.fragment
+def plan_summary():
+    selection = st.session_state.selection
+    if not selection:
         st.warning("يرجى اختيار أطعمة من علامة التبويب السابقة.")
     else:
-        df_selected = pd.DataFrame(st.session_state.selected_foods)
-        
-        # Calculate totals
-        total_protein = df_selected["protein"].sum()
-        total_potassium = df_selected["potassium"].sum()
-        total_phosphorus = df_selected["phosphorus"].sum()
-        total_calories = df_selected["calories"].sum()
-
-        # Nutrient recommendations AI
-        recommendations = []
-        if total_protein < DRI["protein"] * 0.8:
-            recommendations.append("زيادة تناول البروتين! جرب إضافة صدر دجاج مشوي أو بياض البيض.")
-        if total_potassium > DRI["potassium"] * 0.9:
-            recommendations.append("تقليل البوتاسيوم! تجنب أطعمة مثل ثوم أو شبت، واختر خس أو خيار.")
-        if total_phosphorus > DRI["phosphorus"] * 0.9:
-            recommendations.append("تقليل الفوسفور! قلل من أطعمة مثل سردين، واختر خبز أبيض.")
-        if total_calories < DRI["calories"] * 0.8:
-            recommendations.append("زيادة السعرات! أضف أرز أبيض أو مكرونة إلى وجباتك.")
+        with metrics.span("tab2.frame"):
+            # Frame, totals, % of DRI and flags, computed once per selection
+            df_selected, _, evaluation = selection_view(selection.key(), selection)
+            total_protein, total_potassium, total_phosphorus, total_calories = evaluation.totals.tolist()
+            percent = dict(zip(NUTRIENTS, evaluation.percent.tolist()))
+            over = dict(zip(NUTRIENTS, evaluation.over.tolist()))
+
+        # Nutrient recommendations: same-category swaps for the selected foods, plus general
+        # advice for each nutrient still low or high once they are applied
+        with metrics.span("tab2.recommendations"):
+            flagged = [n for n, low, high in zip(NUTRIENTS, evaluation.low, evaluation.high) if low or high]
+            swaps = []
+            if flagged:
+                swaps = get_substitutions().suggest(*selection.arrays(), DRI)
+            if swaps:
+                # General advice only for what the swaps leave low or high
+                after = evaluate(swaps[-1].totals, DRI)
+                flagged = [n for n, low, high in zip(NUTRIENTS, after.low, after.high) if low or high]
+            recommendations = [RECOMMENDATIONS[n] for n in flagged]
+            warnings = {n: WARNINGS[n].format(food=df_selected.at[df_selected[n].idxmax(), "food"]) for n in WARNINGS if over[n]}
 
         # Display nutrient progress with recommendations
         st.subheader("ملخص التغذية")
         cols = st.columns(4)
         with cols[0]:
-            st.metric("البروتين", f"{total_protein:.1f} جم", f"{total_protein/DRI['protein']*100:.1f}% من الحد اليومي")
-            if total_protein > DRI["protein"]:
-                st.warning("تحذير: تجاوزت كمية البروتين الحد اليومي! قلل من أطعمة مثل لحم بقر طازج.")
+            st.metric("البروتين", f"{total_protein:.1f} جم", f"{percent['protein']:.1f}% من الحد اليومي")
+            if over["protein"]:
+                st.warning(warnings["protein"])
         with cols[1]:
-            st.metric("البوتاسيوم", f"{total_potassium:.1f} ملجم", f"{total_potassium/DRI['potassium']*100:.1f}% من الحد اليومي")
-            if total_potassium > DRI["potassium"]:
-                st.warning("تحذير: تجاوزت كمية البوتاسيوم الحد اليومي! تجنب أطعمة مثل ثوم أو شبت.")
+            st.metric("البوتاسيوم", f"{total_potassium:.1f} ملجم", f"{percent['potassium']:.1f}% من الحد اليومي")
+            if over["potassium"]:
+                st.warning(warnings["potassium"])
         with cols[2]:
-            st.metric("الفوسفور", f"{total_phosphorus:.1f} ملجم", f"{total_phosphorus/DRI['phosphorus']*100:.1f}% من الحد اليومي")
-            if total_phosphorus > DRI["phosphorus"]:
-                st.warning("تحذير: تجاوزت كمية الفوسفور الحد اليومي! قلل من أطعمة مثل سردين.")
+            st.metric("الفوسفور", f"{total_phosphorus:.1f} ملجم", f"{percent['phosphorus']:.1f}% من الحد اليومي")
+            if over["phosphorus"]:
+                st.warning(warnings["phosphorus"])
         with cols[3]:
-            st.metric("السعرات", f"{total_calories:.1f} كيلو كالوري", f"{total_calories/DRI['calories']*100:.1f}% من الحد اليومي")
+            st.metric("السعرات", f"{total_calories:.1f} كيلو كالوري", f"{percent['calories']:.1f}% من الحد اليومي")
 
-        if recommendations:
+        if swaps or recommendations:
             st.subheader("توصيات التغذية")
+            for swap in swaps:
+                st.info(f"استبدل {catalog.names[swap.food_id]} بـ {catalog.names[swap.substitute_id]} ({swap.portion:.0f} جم)")
             for rec in recommendations:
                 st.info(rec)
+            if swaps and st.button("تطبيق الاستبدالات المقترحة"):
+                for swap in swaps:
+                    selection.replace(swap.position, swap.substitute_id)
+                logger.info(f"Guest user applied {len(swaps)} food swaps")
+                selection_changed("تم تطبيق الاستبدالات المقترحة!")
 
         # Nutrient distribution chart
         st.subheader("توزيع العناصر الغذائية")
-        nutrient_data = pd.DataFrame({
-            "العنصر": ["البروتين", "البوتاسيوم", "الفوسفور", "السعرات"],
-            "القيمة": [total_protein, total_potassium / 100, total_phosphorus / 100, total_calories / 100]
-        })
-        fig = px.pie(nutrient_data, values='القيمة', names='العنصر', title='توزيع العناصر الغذائية')
-        st.plotly_chart(fig, use_container_width=True)
-
-        # Save meal plan to database
+        with metrics.span("tab2.chart"):
+            st.plotly_chart(nutrient_pie(evaluation.totals.tolist()), use_container_width=True)
+
+        # Save meal plan to database, through the write-behind queue; the success message
+        # is shown once the write has committed
         if st.button("حفظ الخطة الغذائية لليوم"):
             try:
-                foods_json = df_selected.to_json(orient='records', force_ascii=False)
-                c.execute('''
-                    INSERT INTO meal_logs (user_id, date, foods, protein, potassium, phosphorus, calories)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
+                future = writer.submit(
+                    insert_meal_log,
                     "guest",
                     datetime.datetime.now().strftime('%Y-%m-%d'),
-                    foods_json,
-                    total_protein,
-                    total_potassium,
-                    total_phosphorus,
-                    total_calories
-                ))
-                conn.commit()
+                    evaluation.totals.copy(),
+                    list(df_selected[list(ITEM_COLUMNS)].itertuples(index=False, name=None))
+                )
+                st.session_state.pending_writes.append((future, "تم حفظ الخطة الغذائية بنجاح!", "خطأ في حفظ الخطة الغذائية."))
                 logger.info("Guest user saved meal plan")
-                st.success("تم حفظ الخطة الغذائية بنجاح!")
-                st.session_state.selected_foods = []
-                st.rerun()
+                clear_selection()
+                selection_changed()
             except Exception as e:
                 logger.error(f"Meal plan save failed: {e}")
                 st.error("خطأ في حفظ الخطة الغذائية.")
 
-        # Share meal plan
+        # Share meal plan, through the write-behind queue like saves; the link is shown
+        # once the plan is stored
         if st.button("مشاركة الخطة الغذائية"):
             try:
-                share_id = str(uuid.uuid4())
-                foods_json = df_selected.to_json(orient='records', force_ascii=False)
-                c.execute('INSERT INTO shared_plans (id, user_id, foods, created_at) VALUES (?, ?, ?, ?)',
-                          (share_id, "guest", foods_json, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-                conn.commit()
-                share_url = f"https://your-app-url/share/{share_id}"  # Replace with actual deployment URL
-                logger.info(f"Guest user shared meal plan {share_id}")
-                st.success(f"تم إنشاء رابط المشاركة: {share_url}")
+                # Plans are stored under a hash of their content, so sharing an identical
+                # plan again reuses its row and link
+                foods_json = canonical_json(plan_items(catalog, selection.ids, selection.portions))
+                plan_id = share_id(foods_json)
+                future = writer.submit(insert_shared_plan, plan_id, "guest", foods_json,
+                                       datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                share_url = f"{config['app_url']}/?share={plan_id}"
+                st.session_state.pending_writes.append((future, f"تم إنشاء رابط المشاركة: {share_url}", "خطأ في مشاركة الخطة الغذائية."))
+                logger.info(f"Guest user shared meal plan {plan_id}")
             except Exception as e:
                 logger.error(f"Meal plan sharing failed: {e}")
                 st.error("خطأ في مشاركة الخطة الغذائية.")
 
-        # Download options
-        csv = df_selected.to_csv(index=False)
-        st.download_button("تنزيل الخطة كملف CSV", csv, f"خطة_غذائية_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv", "text/csv")
+        # Download options, built on request and keyed by the plan content
+        plan_key = ("plan", selection.key())
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        lazy_download("plan_csv", "تجهيز الخطة كملف CSV", "تنزيل الخطة كملف CSV", content_key("csv", *plan_key),
+                      lambda: plan_csv(df_selected), f"خطة_غذائية_{timestamp}.csv", "text/csv")
 
         # PDF export
         try:
-            buffer = io.BytesIO()
-            c_pdf = canvas.Canvas(buffer, pagesize=letter)
-            c_pdf.setFont("NotoSansArabic", 12)
-            c_pdf.drawString(500, 750, "خطة النظام الغذائي")
-            y = 700
-            for _, row in df_selected.iterrows():
-                c_pdf.drawString(500, y, f"{row['food']} ({row['portion']*100} جم): {row['calories']:.1f} كيلو كالوري")
-                y -= 20
-            c_pdf.save()
-            buffer.seek(0)
-            st.download_button("تنزيل الخطة كملف PDF", buffer, f"خطة_غذائية_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf", "application/pdf")
+            lazy_download("plan_pdf", "تجهيز الخطة كملف PDF", "تنزيل الخطة كملف PDF", content_key("pdf", *plan_key),
+                          lambda: plan_pdf(df_selected), f"خطة_غذائية_{timestamp}.pdf", "application/pdf")
         except Exception as e:
             logger.error(f"PDF export failed: {e}")
             st.error("خطأ في تصدير PDF.")
 
-with tab3:
-    st.header("تتبع الوجبات")
+# Chart resolutions; automatic uses the period's own rollup bucket
+RESOLUTIONS = {
+    "تلقائي": None,
+    "يومي": "day",
+    "أسبوعي": "week",
+    "شهري": "month"
+}
+# Upper bound on trend chart points, whatever the range and resolution
+MAX_TREND_POINTS = 200
+# Days of detailed logs per page
+DETAIL_DAYS = 7
+TREND_VIEWS = 128
+
+# Summary table and trend figure of a range, built once per (user, range, bucket, last
+# log id): a new log changes the id and so rebuilds only that user's views
+@st.cache_resource(max_entries=TREND_VIEWS, show_spinner=False)
+def trend_view(user_id, start, end, bucket, last_log_id):
+    with pool.connection() as conn:
+        totals = fetch_period_totals(conn, user_id, start, end, bucket=bucket)
+    if not totals:
+        return None
+    df_logs = pd.DataFrame([row[:1] + row[2:] for row in totals],
+                           columns=["التاريخ", "البروتين (جم)", "البوتاسيوم (ملجم)", "الفوسفور (ملجم)", "السعرات (كيلو كالوري)"])
+    trend_data = pd.DataFrame({
+        "التاريخ": df_logs["التاريخ"],
+        "البروتين": df_logs["البروتين (جم)"],
+        "البوتاسيوم": df_logs["البوتاسيوم (ملجم)"] / 100,
+        "الفوسفور": df_logs["الفوسفور (ملجم)"] / 100,
+        "السعرات": df_logs["السعرات (كيلو كالوري)"] / 100
+    })
+    series = ["البروتين", "البوتاسيوم", "الفوسفور", "السعرات"]
+    import plotly.express as px
+    fig_trend = px.line(downsample(trend_data, series, MAX_TREND_POINTS), x="التاريخ", y=series,
+                        title="اتجاهات العناصر الغذائية عبر الوقت")
+    return df_logs, fig_trend
+
+def load_log_items(*period_range):
+    with pool.connection() as conn:
+        if not config["partition_dir"]:
+            return fetch_meal_log_items(conn, *period_range)
+        # Logs moved out by maintenance are read from their partition files
+        with attached_partitions(conn, config["partition_dir"], *period_range) as schemas:
+            return fetch_meal_log_items(conn, *period_range, schemas=schemas)
+
+@st.fragment
+def meal_tracker():
     # Date range selection
     st.subheader("تحديد الفترة الزمنية")
-    period = st.selectbox("اختر الفترة:", ["يومي", "أسبوعي", "شهري"])
+    period = st.selectbox("اختر الفترة:", list(PERIOD_BUCKETS))
     selected_date = st.date_input("اختر التاريخ أو نطاق التاريخ:", value=datetime.datetime.now())
+    resolution = st.selectbox("دقة الرسم البياني:", list(RESOLUTIONS))
 
-    # Fetch meal logs
+    # The summary and trend come from the daily rollup, cached until the next log
+    view = None
+    dates = []
     try:
-        if period == "يومي":
-            query_date = selected_date.strftime('%Y-%m-%d')
-            c.execute('SELECT * FROM meal_logs WHERE user_id = ? AND date = ?', ("guest", query_date))
-        elif period == "أسبوعي":
-            start_date = selected_date - datetime.timedelta(days=selected_date.weekday())
-            end_date = start_date + datetime.timedelta(days=6)
-            c.execute('SELECT * FROM meal_logs WHERE user_id = ? AND date BETWEEN ? AND ?',
-                      ("guest", start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-        else:  # شهري
-            start_date = selected_date.replace(day=1)
-            end_date = (start_date + datetime.timedelta(days=31)).replace(day=1) - datetime.timedelta(days=1)
-            c.execute('SELECT * FROM meal_logs WHERE user_id = ? AND date BETWEEN ? AND ?',
-                      ("guest", start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-        
-        logs = c.fetchall()
+        start_date, end_date = period_bounds(period, selected_date)
+        period_range = ("guest", start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        with metrics.span("tab3.query"), pool.connection() as conn:
+            last_log_id = fetch_last_log_id(conn, "guest")
+            dates = fetch_log_dates(conn, *period_range)
+        if dates:
+            view = trend_view(*period_range, RESOLUTIONS[resolution] or PERIOD_BUCKETS[period], last_log_id)
     except Exception as e:
         logger.error(f"Meal log fetch failed: {e}")
         st.error("خطأ في جلب سجلات الوجبات.")
 
-    if not logs:
+    if view is None:
         st.warning("لا توجد سجلات وجبات للفترة المحددة.")
     else:
-        # Process logs
-        log_data = []
-        for log in logs:
-            foods_df = pd.read_json(log[3], orient='records')
-            log_data.append({
-                "date": log[2],
-                "protein": log[4],
-                "potassium": log[5],
-                "phosphorus": log[6],
-                "calories": log[7],
-                "foods": foods_df
-            })
-        
+        df_logs, fig_trend = view
+
         # Display summary
         st.subheader(f"سجل الوجبات ({period})")
-        df_logs = pd.DataFrame([(log['date'], log['protein'], log['potassium'], log['phosphorus'], log['calories']) for log in log_data],
-                               columns=["التاريخ", "البروتين (جم)", "البوتاسيوم (ملجم)", "الفوسفور (ملجم)", "السعرات (كيلو كالوري)"])
         st.dataframe(df_logs)
 
         # Nutrient trends chart
         st.subheader("اتجاهات العناصر الغذائية")
-        trend_data = pd.DataFrame({
-            "التاريخ": [log['date'] for log in log_data],
-            "البروتين": [log['protein'] for log in log_data],
-            "البوتاسيوم": [log['potassium'] / 100 for log in log_data],
-            "الفوسفور": [log['phosphorus'] / 100 for log in log_data],
-            "السعرات": [log['calories'] / 100 for log in log_data]
-        })
-        fig_trend = px.line(trend_data, x="التاريخ", y=["البروتين", "البوتاسيوم", "الفوسفور", "السعرات"],
-                            title="اتجاهات العناصر الغذائية عبر الوقت")
-        st.plotly_chart(fig_trend, use_container_width=True)
-
-        # Detailed food logs
+        with metrics.span("tab3.chart"):
+            st.plotly_chart(fig_trend, use_container_width=True)
+
+        # Detailed food logs, a page of days at a time, newest first
         st.subheader("تفاصيل الوجبات")
-        for log in log_data:
-            st.write(f"**التاريخ: {log['date']}**")
-            st.dataframe(log['foods'][["food", "category", "portion", "protein", "potassium", "phosphorus", "calories"]].rename(columns={
-                "food": "الطعام",
-                "category": "الفئة",
-                "portion": "الكمية (100 جم)",
-                "protein": "البروتين (جم)",
-                "potassium": "البوتاسيوم (ملجم)",
-                "phosphorus": "الفوسفور (ملجم)",
-                "calories": "السعرات (كيلو كالوري)"
-            }))
-
-        # Export logs
+        with metrics.span("tab3.details"):
+            pages = {f"{days[-1]} — {days[0]}": days for days in (dates[n:n + DETAIL_DAYS] for n in range(0, len(dates), DETAIL_DAYS))}
+            page_dates = pages[st.selectbox("الأيام:", list(pages))]
+            try:
+                page_items = load_log_items("guest", page_dates[-1], page_dates[0])
+                if page_items.empty:
+                    # Archived days keep their totals but not their foods
+                    st.info("تفاصيل هذه الأيام مؤرشفة.")
+                else:
+                    st.dataframe(page_items[["date"] + list(FOOD_COLUMNS)].rename(columns={"date": "التاريخ", **FOOD_COLUMNS}),
+                                 use_container_width=True, hide_index=True)
+            except Exception as e:
+                logger.error(f"Meal log items fetch failed: {e}")
+                st.error("خطأ في جلب تفاصيل الوجبات.")
+
+        # Export logs, built on request and keyed by the range and the last log id (logs are
+        # append-only); the full period's items are only fetched for the PDF
         try:
-            csv_logs = df_logs.to_csv(index=False)
-            st.download_button("تنزيل سجل الوجبات كملف CSV", csv_logs, f"سجل_وجبات_{period}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv", "text/csv")
-
-            buffer = io.BytesIO()
-            c_pdf = canvas.Canvas(buffer, pagesize=letter)
-            c_pdf.setFont("NotoSansArabic", 12)
-            c_pdf.drawString(500, 750, f"سجل الوجبات ({period})")
-            y = 700
-            for log in log_data:
-                c_pdf.drawString(500, y, f"التاريخ: {log['date']}")
-                y -= 20
-                for _, row in log['foods'].iterrows():
-                    c_pdf.drawString(500, y, f"{row['food']} ({row['portion']*100} جم): {row['calories']:.1f} كيلو كالوري")
-                    y -= 20
-                y -= 10
-            c_pdf.save()
-            buffer.seek(0)
-            st.download_button("تنزيل سجل الوجبات كملف PDF", buffer, f"سجل_وجبات_{period}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf", "application/pdf")
+            logs_key = ("logs", period, period_range, df_logs.shape, last_log_id)
+            timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+            lazy_download("logs_csv", "تجهيز سجل الوجبات كملف CSV", "تنزيل سجل الوجبات كملف CSV", content_key("csv", *logs_key),
+                          lambda: logs_csv(df_logs), f"سجل_وجبات_{period}_{timestamp}.csv", "text/csv")
+            lazy_download("logs_pdf", "تجهيز سجل الوجبات كملف PDF", "تنزيل سجل الوجبات كملف PDF", content_key("pdf", *logs_key),
+                          lambda: logs_pdf(period, load_log_items(*period_range)), f"سجل_وجبات_{period}_{timestamp}.pdf", "application/pdf")
         except Exception as e:
             logger.error(f"Log export failed: {e}")
             st.error("خطأ في تصدير سجل الوجبات.")
 
-# Close database connection
-try:
-    conn.close()
-except Exception as e:
-    logger.error(f"Database connection close failed: {e}")
\ No newline at end of file
+# Messages from the last action or finished queued write, shown in the sidebar so they
+# are seen whichever tab started it
+with st.sidebar:
+    if "flash" in st.session_state:
+        st.success(st.session_state.pop("flash"))
+    if "flash_error" in st.session_state:
+        st.error(st.session_state.pop("flash_error"))
+    if st.session_state.pending_writes:
+        write_status()
+
+# Tabs for workflow
+tab1, tab2, tab3 = st.tabs(["اختيار الأطعمة", "خطة النظام الغذائي", "تتبع الوجبات"])
+
+with tab1:
+    st.header("اختيار الأطعمة")
+    food_picker(selected_tags, search_query)
+    selected_foods_table()
+
+with tab2:
+    st.header("خطة النظام الغذائي")
+    plan_summary()
+
+with tab3:
+    st.header("تتبع الوجبات")
+    meal_tracker()
@@ -0,0 +1,171 @@
+"""Time the app's hot paths headlessly against a temp database holding years of meal logs.
+
+Each repetition drives a fresh AppTest session through: first run, template load, search,
+add and remove food, rerun with a plan (tab 2 totals and chart), plan exports, save (until
+the write has committed), the tracker at every period, and log exports. Database fetches
+behind the tracker are also timed directly. Prints one JSON object per step.
+
+``--foods N`` pads the catalog with N synthetic foods for the AppTest sessions, which run
+in this process, to time the paths that grow with it: the food list, tag filter and search.
+
+Run from the repository root: ``python -m benchmarks.bench_app [--patients N] [--years N] [--foods N]``
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import data
+from benchmarks.synthetic import synthetic_db, synthetic_food_data, synthetic_patients
+from db import ConnectionPool, fetch_meal_log_items, fetch_period_totals
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+# The app logs and tracks plans for this user
+USER_ID = "guest"
+TEMPLATE = "يوم غسيل الكلى القياسي"
+SEARCH = "سردين"
+PERIODS = ("يومي", "أسبوعي", "شهري", "ربع سنوي", "سنوي")
+
+
+def _timed(timings, name, func):
+    start = time.perf_counter()
+    func()
+    timings.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+
+
+class _Session:
+    """An AppTest session that records how long each step's script run takes."""
+
+    def __init__(self, timings):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(APP_PATH, default_timeout=120)
+        self.timings = timings
+
+    def step(self, name, action=None):
+        _timed(self.timings, name, lambda: (action() if action else self.at).run())
+        if self.at.exception:
+            raise RuntimeError(f"{name}: {self.at.exception[0].message}")
+
+    def button(self, label):
+        return next(b for b in self.at.button if b.label.startswith(label))
+
+    def click(self, name, label):
+        self.step(name, lambda: self.button(label).click())
+
+    def save(self, name, label):
+        """Click the save button and wait for the write-behind queue; the timed step ends
+        with the rerun that shows the acknowledgement."""
+        def action():
+            self.button(label).click().run()
+            for future, *_ in self.at.session_state["pending_writes"]:
+                future.result()
+            return self.at
+        self.step(name, action)
+
+
+def app_session(timings):
+    import streamlit as st
+    # Start each repetition cold: catalog, indexes, pool and export cache are rebuilt
+    st.cache_resource.clear()
+    session = _Session(timings)
+    session.step("first_run")
+    session.step("template_select", lambda: session.at.selectbox[0].select(TEMPLATE))
+    session.click("template_load", "تحميل النموذج")
+    session.step("search", lambda: session.at.text_input[0].input(SEARCH))
+    session.click("add_food", "إضافة")
+    session.step("rerun_with_plan")
+    session.click("remove_food", "إزالة")
+    session.click("export_plan_csv", "تجهيز الخطة كملف CSV")
+    session.click("export_plan_pdf", "تجهيز الخطة كملف PDF")
+    session.save("save", "حفظ الخطة الغذائية لليوم")
+    for period in PERIODS:
+        selectbox = next(s for s in session.at.selectbox if s.label == "اختر الفترة:")
+        session.step(f"tracker_{period}", lambda: selectbox.select(period))
+    session.click("export_logs_csv", "تجهيز سجل الوجبات كملف CSV")
+    session.click("export_logs_pdf", "تجهيز سجل الوجبات كملف PDF")
+
+
+def db_fetches(path, timings):
+    today = datetime.date.today()
+    ranges = {
+        "week": (today - datetime.timedelta(days=6), "day"),
+        "month": (today.replace(day=1), "day"),
+        "quarter": (today - datetime.timedelta(days=90), "week"),
+        "year": (today - datetime.timedelta(days=365), "month"),
+    }
+    pool = ConnectionPool(path, size=1)
+    try:
+        with pool.connection() as conn:
+            for name, (start, bucket) in ranges.items():
+                bounds = (start.isoformat(), today.isoformat())
+                _timed(timings, f"db_totals_{name}", lambda: fetch_period_totals(conn, USER_ID, *bounds, bucket))
+                _timed(timings, f"db_items_{name}", lambda: fetch_meal_log_items(conn, USER_ID, *bounds))
+    finally:
+        pool.close()
+
+
+@contextlib.contextmanager
+def padded_food_data(n_foods):
+    """Extend ``data.food_data`` in place with ``n_foods`` synthetic foods, restoring it on exit.
+
+    The app builds its catalog from that dict, so sessions started inside see the padded
+    catalog; the app itself never adds synthetic foods.
+    """
+    original = {category: list(items) for category, items in data.food_data.items()}
+    try:
+        for category, items in synthetic_food_data(n_foods).items():
+            data.food_data.setdefault(category, []).extend(items)
+        yield
+    finally:
+        data.food_data.clear()
+        data.food_data.update(original)
+
+
+def run(patients=20, years=2, repeat=3, foods=0):
+    from engine import get_catalog
+
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        start = time.perf_counter()
+        logs = synthetic_db(path, get_catalog(), [USER_ID] + synthetic_patients(patients), years)
+        seed_ms = (time.perf_counter() - start) * 1000
+        previous = os.environ.get("DB_PATH")
+        os.environ["DB_PATH"] = path
+        try:
+            with padded_food_data(foods):
+                for _ in range(repeat):
+                    db_fetches(path, timings)
+                    app_session(timings)
+        finally:
+            if previous is None:
+                os.environ.pop("DB_PATH")
+            else:
+                os.environ["DB_PATH"] = previous
+
+    base = {"benchmark": "app", "patients": patients + 1, "years": years, "foods": foods, "meal_logs": logs, "seed_ms": seed_ms}
+    return [
+        {**base, "step": step, "runs": len(samples), "best_ms": min(samples), "median_ms": statistics.median(samples)}
+        for step, samples in timings.items()
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=20, help="synthetic patients besides the app's user")
+    parser.add_argument("--years", type=int, default=2, help="years of meal logs per patient, ending today")
+    parser.add_argument("--repeat", type=int, default=3, help="AppTest sessions to time")
+    parser.add_argument("--foods", type=int, default=0, help="synthetic foods added to the app's catalog")
+    args = parser.parse_args(argv)
+    for result in run(args.patients, args.years, args.repeat, args.foods):
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
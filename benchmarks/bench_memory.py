@@ -0,0 +1,85 @@
+"""Measure the memory each session's food selection takes, per state representation.
+
+Compares the original list of per-food dicts, parallel id/portion lists and the compact
+Selection, by tracing allocations across many simulated sessions. Also reports the size
+of the derived DataFrame, which is now memoized and shared instead of rebuilt per rerun.
+
+Run from the repository root: ``python -m benchmarks.bench_memory``
+"""
+
+import json
+import tracemalloc
+
+import numpy as np
+
+from catalog import NUTRIENTS
+from engine import get_catalog
+from nutrition import selection_frame
+from selection import Selection
+
+PLAN_SIZES = (12, 50)
+SESSIONS = 1_000
+
+
+def as_dicts(catalog, ids, portions):
+    """The original state: one dict per food copying its name, category, tags and nutrients."""
+    return [
+        {
+            "food": catalog.names[i],
+            "category": catalog.categories[i],
+            "portion": p / 100,
+            "tags": list(catalog.tags[i]),
+            **{n: float(v) for n, v in zip(NUTRIENTS, catalog.nutrients[i] * p / 100)},
+        }
+        for i, p in zip(ids, portions)
+    ]
+
+
+def as_lists(catalog, ids, portions):
+    return [int(i) for i in ids], [float(p) for p in portions]
+
+
+def as_selection(catalog, ids, portions):
+    selection = Selection(ids.tolist(), portions.tolist())
+    selection.key()
+    return selection
+
+
+REPRESENTATIONS = {"dicts": as_dicts, "lists": as_lists, "selection": as_selection}
+
+
+def bytes_per_session(build, catalog, plans):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    states = [build(catalog, ids, portions) for ids, portions in plans]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del states
+    return (after - before) / len(plans)
+
+
+def run(plan_sizes=PLAN_SIZES, sessions=SESSIONS, seed=0):
+    catalog = get_catalog()
+    rng = np.random.default_rng(seed)
+    results = []
+    for size in plan_sizes:
+        plans = [
+            (rng.integers(len(catalog), size=size), rng.choice([50.0, 100.0, 150.0, 200.0], size=size))
+            for _ in range(sessions)
+        ]
+        frame = selection_frame(catalog, *plans[0])
+        for name, build in REPRESENTATIONS.items():
+            results.append({
+                "benchmark": "memory",
+                "representation": name,
+                "items": size,
+                "sessions": sessions,
+                "bytes_per_session": bytes_per_session(build, catalog, plans),
+                "frame_bytes": int(frame.memory_usage(deep=True).sum()),
+            })
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        print(json.dumps(result))
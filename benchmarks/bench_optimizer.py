@@ -0,0 +1,43 @@
+"""Time the meal plan optimizer on synthetic catalogs of growing size.
+
+Run from the repository root: ``python -m benchmarks.bench_optimizer``
+"""
+
+import json
+import time
+
+from benchmarks.synthetic import synthetic_catalog
+from data import DRI
+from optimizer import candidate_ids, default_limits, plan_day, plan_days
+
+SIZES = (50, 5_000, 50_000)
+CATEGORY_MIN = {"البروتينات": 50}
+
+
+def _best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes=SIZES, repeat=3):
+    limits = default_limits(DRI)
+    results = []
+    for n_foods in sizes:
+        catalog = synthetic_catalog(n_foods)
+        ids = candidate_ids(catalog)
+        results.append({
+            "benchmark": "optimizer",
+            "foods": n_foods,
+            "plan_day_ms": _best_of(lambda: plan_day(catalog, limits, ids, category_min=CATEGORY_MIN), repeat) * 1000,
+            "plan_week_ms": _best_of(lambda: plan_days(catalog, limits, 7, ids, category_min=CATEGORY_MIN), 1) * 1000,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        print(json.dumps(result))
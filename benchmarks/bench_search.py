@@ -0,0 +1,50 @@
+"""Time food search (prefix and fuzzy) on synthetic catalogs of growing size.
+
+Run from the repository root: ``python -m benchmarks.bench_search``
+"""
+
+import json
+import time
+
+from benchmarks.synthetic import synthetic_catalog
+from search import SearchIndex
+
+SIZES = (50, 5_000, 50_000)
+# Short prefix, full word, word with a typo and an exact full name
+QUERIES = ("ت", "دجاج", "دجاح", "تفاح 42")
+LIMIT = 50
+
+
+def _best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes=SIZES, queries=QUERIES, repeat=5):
+    results = []
+    for n_foods in sizes:
+        catalog = synthetic_catalog(n_foods)
+        start = time.perf_counter()
+        index = SearchIndex(catalog.names)
+        build_ms = (time.perf_counter() - start) * 1000
+        for query in queries:
+            results.append({
+                "benchmark": "search",
+                "foods": n_foods,
+                "query": query,
+                "build_ms": build_ms,
+                "matches": len(index.search(query)),
+                "prefix_ms": _best_of(lambda: index.prefix(query, LIMIT), repeat) * 1000,
+                "search_ms": _best_of(lambda: index.search(query, LIMIT), repeat) * 1000,
+                "search_all_ms": _best_of(lambda: index.search(query), repeat) * 1000,
+            })
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        print(json.dumps(result, ensure_ascii=False))
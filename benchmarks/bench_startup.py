@@ -0,0 +1,56 @@
+"""Measure cold-start latency: a fresh process importing Streamlit and painting the app once.
+
+Run from the repository root: ``python -m benchmarks.bench_startup``
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules that should stay unloaded until a chart, PDF or optimized plan is requested
+# (Streamlit itself already imports plotly's core, but not plotly.express)
+LAZY_MODULES = ("plotly.express", "reportlab", "scipy")
+
+_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=120).run()
+painted = time.perf_counter()
+at.run()
+rerun = time.perf_counter()
+print(json.dumps({{
+    "streamlit_import_ms": (imported - start) * 1000,
+    "first_paint_ms": (painted - imported) * 1000,
+    "rerun_ms": (rerun - painted) * 1000,
+    "lazy_modules_loaded": sorted(m for m in {LAZY_MODULES!r} if m in sys.modules),
+    "errors": [e.message for e in at.exception],
+}}))
+"""
+
+
+def cold_start():
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DB_PATH=os.path.join(tmp, "bench.db"))
+        completed = subprocess.run([sys.executable, "-c", _PROBE], cwd=ROOT, env=env,
+                                   capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(repeat=3):
+    """Best of ``repeat`` cold starts for each timing."""
+    samples = [cold_start() for _ in range(repeat)]
+    result = {"benchmark": "startup", "runs": repeat}
+    for key in ("streamlit_import_ms", "first_paint_ms", "rerun_ms"):
+        result[key] = min(sample[key] for sample in samples)
+    result["lazy_modules_loaded"] = sorted({m for sample in samples for m in sample["lazy_modules_loaded"]})
+    result["errors"] = [error for sample in samples for error in sample["errors"]]
+    return result
+
+
+if __name__ == "__main__":
+    print(json.dumps(run()))
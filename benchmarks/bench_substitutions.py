@@ -0,0 +1,66 @@
+"""Time food substitution suggestions on synthetic catalogs of growing size.
+
+Run from the repository root: ``python -m benchmarks.bench_substitutions``
+"""
+
+import json
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_food_data
+from catalog import FoodCatalog
+from data import DRI
+from substitutions import SubstitutionIndex
+
+SIZES = (50, 5_000, 50_000)
+PLAN_SIZE = 12
+PORTION = 150.0
+
+
+def _best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes=SIZES, repeat=5, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for n_foods in sizes:
+        food_data = synthetic_food_data(n_foods, seed)
+        catalog = FoodCatalog.from_food_data(food_data)
+        start = time.perf_counter()
+        index = SubstitutionIndex(catalog, DRI)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        ids = rng.choice(len(catalog), PLAN_SIZE)
+        portions = np.full(PLAN_SIZE, PORTION)
+
+        # Drop one food from the first category: only that category's tree is rebuilt
+        category = next(iter(food_data))
+        food_data[category] = food_data[category][:-1]
+        changed = FoodCatalog.from_food_data(food_data)
+        start = time.perf_counter()
+        rebuilt = index.update(changed)
+        update_ms = (time.perf_counter() - start) * 1000
+        index.update(catalog)
+
+        results.append({
+            "benchmark": "substitutions",
+            "foods": n_foods,
+            "build_ms": build_ms,
+            "suggest_ms": _best_of(lambda: index.suggest(ids, portions, DRI), repeat) * 1000,
+            "update_ms": update_ms,
+            "trees_rebuilt": rebuilt,
+            "trees": len(catalog.category_ids),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        print(json.dumps(result))
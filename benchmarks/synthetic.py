@@ -0,0 +1,74 @@
+"""Synthetic data for benchmarks: scaled-up copies of the real catalog, patients and meal logs."""
+
+import datetime
+import itertools
+
+import numpy as np
+
+from catalog import FoodCatalog, NUTRIENTS
+from data import food_data
+from db import ConnectionPool, insert_meal_logs
+from nutrition import item_nutrients
+
+PORTIONS = (50.0, 100.0, 150.0, 200.0)
+
+
+def synthetic_food_data(n_foods, seed=0):
+    """``food_data``-shaped dict with ``n_foods`` variants of the real foods.
+
+    Each variant keeps its source food's category and tags, with nutrients jittered by up to ±30%.
+    """
+    rng = np.random.default_rng(seed)
+    sources = [(category, name, tags, nutrients) for category, items in food_data.items() for name, tags, nutrients in items]
+    picks = rng.integers(len(sources), size=n_foods)
+    jitter = rng.uniform(0.7, 1.3, size=(n_foods, len(NUTRIENTS)))
+    scaled = {}
+    for n, (pick, factors) in enumerate(zip(picks.tolist(), jitter.tolist())):
+        category, name, tags, nutrients = sources[pick]
+        scaled.setdefault(category, []).append((
+            f"{name} {n}",
+            tags,
+            {nutrient: round(nutrients[nutrient] * factor, 2) for nutrient, factor in zip(NUTRIENTS, factors)}
+        ))
+    return scaled
+
+
+def synthetic_catalog(n_foods, seed=0):
+    return FoodCatalog.from_food_data(synthetic_food_data(n_foods, seed))
+
+
+def synthetic_patients(n_patients):
+    return [f"patient-{n:05d}" for n in range(n_patients)]
+
+
+def synthetic_meal_logs(catalog, user_ids, start, days, meals_per_day=3, items_per_meal=4, seed=0):
+    """``insert_meal_logs`` rows: ``meals_per_day`` random meals per user per day from ``start`` on."""
+    rng = np.random.default_rng(seed)
+    for day in range(days):
+        date = (start + datetime.timedelta(days=day)).isoformat()
+        for user_id in user_ids:
+            for _ in range(meals_per_day):
+                ids = rng.integers(len(catalog), size=items_per_meal)
+                portions = rng.choice(PORTIONS, size=items_per_meal)
+                nutrients = item_nutrients(catalog, ids, portions)
+                items = [
+                    (catalog.categories[i], catalog.names[i], portion / 100, *row)
+                    for i, portion, row in zip(ids.tolist(), portions.tolist(), nutrients.tolist())
+                ]
+                yield user_id, date, nutrients.sum(axis=0).tolist(), items
+
+
+def synthetic_db(path, catalog, user_ids, years=1, meals_per_day=3, items_per_meal=4, seed=0, batch_size=5_000):
+    """Fill the SQLite database at ``path`` with ``years`` of meal logs ending today; returns the log count."""
+    days = 365 * years
+    start = datetime.date.today() - datetime.timedelta(days=days - 1)
+    logs = synthetic_meal_logs(catalog, user_ids, start, days, meals_per_day, items_per_meal, seed)
+    pool = ConnectionPool(path, size=1)
+    count = 0
+    try:
+        while batch := list(itertools.islice(logs, batch_size)):
+            with pool.connection() as conn:
+                count += insert_meal_logs(conn, batch)
+    finally:
+        pool.close()
+    return count
@@ -0,0 +1,90 @@
+"""Indexed food catalog built once per process from the static food data."""
+
+import numpy as np
+
+# Column order of the nutrient matrix
+NUTRIENTS = ("protein", "potassium", "phosphorus", "calories")
+
+
+class FoodCatalog:
+    """Foods addressed by integer id.
+
+    - ``(category, name) -> id`` hash index for O(1) lookups
+    - one packed bitset per tag and per category for filtering
+    - nutrients per 100 g as one contiguous ``(n_foods, len(NUTRIENTS))`` array
+    """
+
+    def __init__(self, entries):
+        self.names = []
+        self.categories = []
+        self.tags = []
+        self.category_ids = {}
+        self._index = {}
+        tag_ids = {}
+        rows = []
+        for category, name, tags, nutrients in entries:
+            key = (category, name)
+            if key in self._index:
+                raise ValueError(f"Duplicate food {name!r} in category {category!r}")
+            food_id = len(self.names)
+            self._index[key] = food_id
+            self.names.append(name)
+            self.categories.append(category)
+            self.tags.append(tuple(tags))
+            self.category_ids.setdefault(category, []).append(food_id)
+            for tag in tags:
+                tag_ids.setdefault(tag, []).append(food_id)
+            rows.append([nutrients[n] for n in NUTRIENTS])
+
+        self.nutrients = np.array(rows, dtype=np.float64).reshape(-1, len(NUTRIENTS))
+        self.nutrients.setflags(write=False)
+        self.all_tags = sorted(tag_ids)
+        self._tag_bits = {tag: self._bitset(ids) for tag, ids in tag_ids.items()}
+        self._category_bits = {cat: self._bitset(ids) for cat, ids in self.category_ids.items()}
+
+    @classmethod
+    def from_food_data(cls, food_data):
+        return cls(
+            (category, name, tags, nutrients)
+            for category, items in food_data.items()
+            for name, tags, nutrients in items
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def _bitset(self, ids):
+        mask = np.zeros(len(self.names), dtype=bool)
+        mask[ids] = True
+        return np.packbits(mask, bitorder="little")
+
+    def lookup(self, category, name):
+        """Return the id of ``name`` in ``category``, or None if unknown."""
+        return self._index.get((category, name))
+
+    def filter(self, tags=(), category=None):
+        """Ids of foods carrying every tag in ``tags``, optionally within one category."""
+        if not tags:
+            if category is None:
+                return list(range(len(self.names)))
+            return list(self.category_ids.get(category, ()))
+        bitsets = [self._tag_bits.get(tag) for tag in tags]
+        if category is not None:
+            bitsets.append(self._category_bits.get(category))
+        if any(bits is None for bits in bitsets):
+            return []
+        bits = np.bitwise_and.reduce(bitsets) if len(bitsets) > 1 else bitsets[0]
+        return np.flatnonzero(np.unpackbits(bits, count=len(self.names), bitorder="little")).tolist()
+
+    def resolve(self, items):
+        """Map ``{"food", "category", "portion"}`` items to id and portion arrays.
+
+        Items that are not in the catalog are skipped.
+        """
+        ids, portions = [], []
+        for item in items:
+            food_id = self._index.get((item["category"], item["food"]))
+            if food_id is not None:
+                ids.append(food_id)
+                portions.append(item["portion"])
+        return np.array(ids, dtype=np.intp), np.array(portions, dtype=np.float64)
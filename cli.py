@@ -0,0 +1,159 @@
+"""Command line entry point for bulk, headless meal plan processing.
+
+Examples::
+
+    python cli.py evaluate plans.jsonl --output results.jsonl
+    python cli.py save plans.jsonl --workers 4
+    python cli.py export plans.jsonl --out-dir exports --format pdf
+    python cli.py export-logs history.parquet --user p1
+    python cli.py import-logs history.csv.gz
+    python cli.py maintain --archive-dir archive --archive-after 730 --expire-shares-after 90
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+
+import engine
+import maintenance
+import transfer
+from db import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+def _write_results(results, output):
+    stream = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+    count = 0
+    try:
+        for result in results:
+            stream.write(json.dumps(engine.json_result(result), ensure_ascii=False) + "\n")
+            count += 1
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    return count
+
+
+def cmd_evaluate(args):
+    results = engine.evaluate_all(engine.read_requests(args.input), args.workers, args.chunk_size)
+    count = _write_results(results, args.output)
+    logger.info(f"Evaluated {count} plans")
+
+
+def cmd_save(args):
+    pool = ConnectionPool(args.db)
+    try:
+        results = engine.evaluate_all(engine.read_requests(args.input), args.workers, args.chunk_size)
+        count, rejected = engine.save_results(pool, results, args.chunk_size)
+    finally:
+        pool.close()
+    logger.info(f"Saved {count} plans to {args.db}")
+    if rejected:
+        logger.error(f"Rejected {rejected} plans with foods not in the catalog")
+
+
+def cmd_export(args):
+    results = engine.export_all(engine.read_requests(args.input), args.out_dir, args.format, args.workers, args.chunk_size)
+    count = sum(1 for _ in results)
+    logger.info(f"Exported {count} plans to {args.out_dir}")
+
+
+def cmd_export_logs(args):
+    pool = ConnectionPool(args.db)
+    try:
+        count = transfer.export_history(pool, args.path, args.user, args.start, args.end, args.batch_size)
+    finally:
+        pool.close()
+    logger.info(f"Exported {count} logged foods to {args.path}")
+
+
+def cmd_import_logs(args):
+    pool = ConnectionPool(args.db)
+    try:
+        count = transfer.import_history(pool, args.path, args.batch_size, args.restore)
+    finally:
+        pool.close()
+    logger.info(f"Imported {count} meal logs into {args.db}")
+
+
+def cmd_maintain(args):
+    pool = ConnectionPool(args.db)
+    try:
+        summary = maintenance.run_maintenance(
+            pool, args.archive_dir, args.archive_after, args.expire_shares_after,
+            args.partition_dir, args.partition_after, args.partition_by, args.vacuum_pages
+        )
+    finally:
+        pool.close()
+    logger.info(f"Maintenance of {args.db} done: {json.dumps(summary)}")
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("input", help="JSON Lines plan requests, or - for stdin")
+    common.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU; 1 runs in-process)")
+    common.add_argument("--chunk-size", type=int, default=engine.CHUNK_SIZE,
+                        help="plans per worker task and per insert transaction")
+
+    history = argparse.ArgumentParser(add_help=False)
+    history.add_argument("path", help="history file: .parquet, .csv or .csv.gz")
+    history.add_argument("--db", default=os.getenv("DB_PATH", "meal_logs.db"), help="SQLite database path")
+    history.add_argument("--batch-size", type=int, default=transfer.BATCH_SIZE,
+                         help="rows per read and write on export, logs per insert transaction on import")
+
+    parser = argparse.ArgumentParser(description="Bulk meal plan evaluation, saving and export, meal history transfer and database maintenance.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    evaluate = commands.add_parser("evaluate", parents=[common], help="compute totals, %% of DRI and flags")
+    evaluate.add_argument("--output", default="-", help="JSON Lines results (default: stdout)")
+    evaluate.set_defaults(func=cmd_evaluate)
+
+    save = commands.add_parser("save", parents=[common], help="evaluate and insert plans into meal_logs")
+    save.add_argument("--db", default=os.getenv("DB_PATH", "meal_logs.db"), help="SQLite database path")
+    save.set_defaults(func=cmd_save)
+
+    export = commands.add_parser("export", parents=[common], help="write one CSV or PDF per plan")
+    export.add_argument("--out-dir", required=True, help="directory for the exported files")
+    export.add_argument("--format", choices=("csv", "pdf"), default="csv")
+    export.set_defaults(func=cmd_export)
+
+    export_logs = commands.add_parser("export-logs", parents=[history], help="stream meal history to a Parquet or CSV file")
+    export_logs.add_argument("--user", default=None, help="only this user's logs (default: every user)")
+    export_logs.add_argument("--start", default=None, help="first ISO date to include")
+    export_logs.add_argument("--end", default=None, help="last ISO date to include")
+    export_logs.set_defaults(func=cmd_export_logs)
+
+    import_logs = commands.add_parser("import-logs", parents=[history], help="append a Parquet or CSV history file to meal_logs")
+    import_logs.add_argument("--restore", action="store_true",
+                             help="loading an archive back: leave existing daily totals unchanged")
+    import_logs.set_defaults(func=cmd_import_logs)
+
+    maintain = commands.add_parser("maintain", help="archive, partition and expire old data, then vacuum and analyze")
+    maintain.add_argument("--db", default=os.getenv("DB_PATH", "meal_logs.db"), help="SQLite database path")
+    maintain.add_argument("--archive-dir", default=None, help="directory for Parquet archives of compacted logs")
+    maintain.add_argument("--archive-after", type=int, default=None, help="archive and delete logs older than this many days")
+    maintain.add_argument("--expire-shares-after", type=int, default=None,
+                          help="delete shared plans neither shared nor viewed for this many days")
+    maintain.add_argument("--partition-dir", default=os.getenv("PARTITION_DIR"), help="directory for partition databases")
+    maintain.add_argument("--partition-after", type=int, default=None, help="move logs older than this many days to partitions")
+    maintain.add_argument("--partition-by", choices=tuple(maintenance.PARTITION_KEYS), default="year")
+    maintain.add_argument("--vacuum-pages", type=int, default=None, help="free pages to release (default: all)")
+    maintain.set_defaults(func=cmd_maintain)
+    return parser
+
+
+def main(argv=None):
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
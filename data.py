@@ -0,0 +1,110 @@
+"""Static nutrition data: the food catalog source, meal templates and DRI limits."""
+
+# Simulated nutritional data
+food_data = {
+    "البروتينات": [
+        ("صدر دجاج مشوي", ["بروتين عالي", "فوسفور منخفض"], {"protein": 31, "potassium": 220, "phosphorus": 210, "calories": 165}),
+        ("بياض البيض", ["بروتين عالي", "بوتاسيوم منخفض"], {"protein": 3.6, "potassium": 54, "phosphorus": 15, "calories": 17}),
+        ("سمك التونة المعلب", ["بروتين عالي"], {"protein": 26, "potassium": 200, "phosphorus": 180, "calories": 120}),
+        ("سردين", ["بروتين عالي"], {"protein": 25, "potassium": 397, "phosphorus": 490, "calories": 208}),
+        ("لحم بقر طازج", ["بروتين عالي"], {"protein": 26, "potassium": 318, "phosphorus": 200, "calories": 250}),
+        ("أسماك أخرى طازجة", ["بروتين عالي"], {"protein": 22, "potassium": 350, "phosphorus": 250, "calories": 140}),
+    ],
+    "خضروات منخفضة البوتاسيوم": [
+        ("خس", ["بوتاسيوم منخفض"], {"protein": 1.4, "potassium": 194, "phosphorus": 20, "calories": 15}),
+        ("خيار", ["بوتاسيوم منخفض"], {"protein": 0.7, "potassium": 147, "phosphorus": 24, "calories": 16}),
+        ("بصل", ["بوتاسيوم منخفض"], {"protein": 1.1, "potassium": 146, "phosphorus": 29, "calories": 40}),
+        ("باذنجان", ["بوتاسيوم منخفض"], {"protein": 1, "potassium": 229, "phosphorus": 24, "calories": 25}),
+        ("فلفل رومي", ["بوتاسيوم منخفض"], {"protein": 1, "potassium": 211, "phosphorus": 26, "calories": 31}),
+        ("قرنبيط", ["بوتاسيوم منخفض"], {"protein": 1.9, "potassium": 299, "phosphorus": 44, "calories": 25}),
+        ("ملفوف", ["بوتاسيوم منخفض"], {"protein": 1.3, "potassium": 170, "phosphorus": 26, "calories": 25}),
+        ("كرفس", ["بوتاسيوم منخفض"], {"protein": 0.7, "potassium": 260, "phosphorus": 24, "calories": 16}),
+    ],
+    "فواكه منخفضة البوتاسيوم": [
+        ("تفاح", ["بوتاسيوم منخفض"], {"protein": 0.3, "potassium": 107, "phosphorus": 11, "calories": 52}),
+        ("توت", ["بوتاسيوم منخفض"], {"protein": 1.4, "potassium": 77, "phosphorus": 22, "calories": 57}),
+        ("عنب", ["بوتاسيوم منخفض"], {"protein": 0.7, "potassium": 191, "phosphorus": 20, "calories": 69}),
+        ("أناناس", ["بوتاسيوم منخفض"], {"protein": 0.5, "potassium": 109, "phosphorus": 8, "calories": 50}),
+        ("برقوق", ["بوتاسيوم منخفض"], {"protein": 0.7, "potassium": 157, "phosphorus": 16, "calories": 46}),
+        ("شمام", ["بوتاسيوم منخفض"], {"protein": 0.8, "potassium": 267, "phosphorus": 15, "calories": 34}),
+    ],
+    "الكربوهيدرات والحبوب": [
+        ("خبز أبيض", ["فوسفور منخفض"], {"protein": 3.2, "potassium": 115, "phosphorus": 99, "calories": 77}),
+        ("أرز أبيض", ["فوسفور منخفض"], {"protein": 2.7, "potassium": 35, "phosphorus": 43, "calories": 130}),
+        ("مكرونة", ["فوسفور منخفض"], {"protein": 5, "potassium": 44, "phosphorus": 58, "calories": 131}),
+        ("مقرمشات الذرة", ["فوسفور منخفض"], {"protein": 1, "potassium": 36, "phosphorus": 30, "calories": 110}),
+        ("رقائق التورتيلا غير مملحة", ["صوديوم منخفض"], {"protein": 2, "potassium": 100, "phosphorus": 140, "calories": 140}),
+    ],
+    "معززات النكهة": [
+        ("ليمون", ["صوديوم منخفض"], {"protein": 1.1, "potassium": 138, "phosphorus": 16, "calories": 29}),
+        ("ثوم", ["صوديوم منخفض"], {"protein": 6.4, "potassium": 401, "phosphorus": 153, "calories": 149}),
+        ("بصل", ["صوديوم منخفض"], {"protein": 1.1, "potassium": 146, "phosphorus": 29, "calories": 40}),
+        ("كزبرة", ["صوديوم منخفض"], {"protein": 2.1, "potassium": 521, "phosphorus": 48, "calories": 23}),
+        ("شبت", ["صوديوم منخفض"], {"protein": 3.5, "potassium": 738, "phosphorus": 66, "calories": 43}),
+        ("زعتر", ["صوديوم منخفض"], {"protein": 5.6, "potassium": 609, "phosphorus": 106, "calories": 101}),
+        ("إكليل الجبل", ["صوديوم منخفض"], {"protein": 3.3, "potassium": 668, "phosphorus": 66, "calories": 131}),
+    ]
+}
+
+# Meal plan templates
+meal_templates = {
+    "يوم غسيل الكلى القياسي": {
+        "الإفطار": [
+            {"food": "بياض البيض", "category": "البروتينات", "portion": 100},
+            {"food": "خبز أبيض", "category": "الكربوهيدرات والحبوب", "portion": 50},
+            {"food": "تفاح", "category": "فواكه منخفضة البوتاسيوم", "portion": 100}
+        ],
+        "الغداء": [
+            {"food": "صدر دجاج مشوي", "category": "البروتينات", "portion": 100},
+            {"food": "أرز أبيض", "category": "الكربوهيدرات والحبوب", "portion": 100},
+            {"food": "خس", "category": "خضروات منخفضة البوتاسيوم", "portion": 50}
+        ],
+        "العشاء": [
+            {"food": "سمك التونة المعلب", "category": "البروتينات", "portion": 100},
+            {"food": "ملفوف", "category": "خضروات منخفضة البوتاسيوم", "portion": 50},
+            {"food": "ليمون", "category": "معززات النكهة", "portion": 10}
+        ]
+    },
+    "يوم منخفض السعرات": {
+        "الإفطار": [
+            {"food": "بياض البيض", "category": "البروتينات", "portion": 50},
+            {"food": "توت", "category": "فواكه منخفضة البوتاسيوم", "portion": 100}
+        ],
+        "الغداء": [
+            {"food": "صدر دجاج مشوي", "category": "البروتينات", "portion": 80},
+            {"food": "خيار", "category": "خضروات منخفضة البوتاسيوم", "portion": 100}
+        ],
+        "العشاء": [
+            {"food": "سمك التونة المعلب", "category": "البروتينات", "portion": 80},
+            {"food": "قرنبيط", "category": "خضروات منخفضة البوتاسيوم", "portion": 50}
+        ]
+    },
+    "يوم عالي البروتين": {
+        "الإفطار": [
+            {"food": "بياض البيض", "category": "البروتينات", "portion": 150},
+            {"food": "خبز أبيض", "category": "الكربوهيدرات والحبوب", "portion": 50}
+        ],
+        "الغداء": [
+            {"food": "صدر دجاج مشوي", "category": "البروتينات", "portion": 150},
+            {"food": "أرز أبيض", "category": "الكربوهيدرات والحبوب", "portion": 100},
+            {"food": "فلفل رومي", "category": "خضروات منخفضة البوتاسيوم", "portion": 50}
+        ],
+        "العشاء": [
+            {"food": "لحم بقر طازج", "category": "البروتينات", "portion": 100},
+            {"food": "ملفوف", "category": "خضروات منخفضة البوتاسيوم", "portion": 50}
+        ]
+    }
+}
+
+# Recommended daily intake for dialysis patients
+DRI = {
+    "protein": 60,  # g
+    "potassium": 2000,  # mg
+    "phosphorus": 800,  # mg
+    "calories": 2000  # kcal
+}
+
+# Minimum grams per meal from these categories in optimizer-generated plans
+meal_minimums = {
+    "البروتينات": 50
+}
@@ -0,0 +1,386 @@
+"""SQLite data layer: pooled WAL connections and versioned schema migrations."""
+
+import contextlib
+import json
+import logging
+import queue
+import sqlite3
+
+import pandas as pd
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Applied to every new connection. auto_vacuum only takes effect on a new database (it
+# must precede WAL mode); maintenance.vacuum converts older ones.
+PRAGMAS = (
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+)
+
+
+def _create_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS meal_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT DEFAULT 'guest',
+            date TEXT,
+            foods TEXT,
+            protein REAL,
+            potassium REAL,
+            phosphorus REAL,
+            calories REAL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS shared_plans (
+            id TEXT PRIMARY KEY,
+            user_id TEXT DEFAULT 'guest',
+            foods TEXT,
+            created_at TEXT
+        )
+    ''')
+
+
+def _index_meal_logs_by_user_date(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_meal_logs_user_date ON meal_logs (user_id, date)')
+
+
+# Columns of one logged food, in insert order
+ITEM_COLUMNS = ("category", "food", "portion", "protein", "potassium", "phosphorus", "calories")
+
+
+def _move_foods_to_items(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS meal_log_items (
+            id INTEGER PRIMARY KEY,
+            log_id INTEGER NOT NULL REFERENCES meal_logs (id) ON DELETE CASCADE,
+            category TEXT NOT NULL,
+            food TEXT NOT NULL,
+            portion REAL,
+            protein REAL,
+            potassium REAL,
+            phosphorus REAL,
+            calories REAL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_meal_log_items_log ON meal_log_items (log_id)')
+    # Unpack the JSON blobs written by earlier versions, then drop them
+    logs = conn.execute('SELECT id, foods FROM meal_logs WHERE foods IS NOT NULL').fetchall()
+    conn.executemany(
+        f'INSERT INTO meal_log_items (log_id, {", ".join(ITEM_COLUMNS)}) VALUES (?{", ?" * len(ITEM_COLUMNS)})',
+        ((log_id, *(item.get(col) for col in ITEM_COLUMNS)) for log_id, foods in logs for item in json.loads(foods))
+    )
+    conn.execute('UPDATE meal_logs SET foods = NULL WHERE foods IS NOT NULL')
+
+
+def _create_daily_totals(conn):
+    # Per-day rollup of meal_logs, kept current by a trigger on every insert. It is the
+    # durable daily summary: removing raw logs later leaves their day's totals in place.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            meals INTEGER NOT NULL DEFAULT 0,
+            protein REAL NOT NULL DEFAULT 0,
+            potassium REAL NOT NULL DEFAULT 0,
+            phosphorus REAL NOT NULL DEFAULT 0,
+            calories REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, date)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_meal_logs_daily_totals AFTER INSERT ON meal_logs
+        BEGIN
+            INSERT INTO daily_totals (user_id, date, meals, protein, potassium, phosphorus, calories)
+            VALUES (COALESCE(NEW.user_id, 'guest'), NEW.date, 1, COALESCE(NEW.protein, 0), COALESCE(NEW.potassium, 0),
+                    COALESCE(NEW.phosphorus, 0), COALESCE(NEW.calories, 0))
+            ON CONFLICT (user_id, date) DO UPDATE SET
+                meals = meals + 1,
+                protein = protein + excluded.protein,
+                potassium = potassium + excluded.potassium,
+                phosphorus = phosphorus + excluded.phosphorus,
+                calories = calories + excluded.calories;
+        END
+    ''')
+    conn.execute('''
+        INSERT OR REPLACE INTO daily_totals (user_id, date, meals, protein, potassium, phosphorus, calories)
+        SELECT COALESCE(user_id, 'guest'), date, COUNT(*), TOTAL(protein), TOTAL(potassium), TOTAL(phosphorus), TOTAL(calories)
+        FROM meal_logs WHERE date IS NOT NULL GROUP BY 1, 2
+    ''')
+
+
+def _index_meal_logs_by_user_id(conn):
+    # Lets a user's latest log id be read without scanning their history
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_meal_logs_user_id ON meal_logs (user_id, id)')
+
+
+def _add_shared_plan_last_viewed(conn):
+    # Day a plan's link was last opened, so retention keeps links that are still in use
+    conn.execute('ALTER TABLE shared_plans ADD COLUMN last_viewed TEXT')
+
+
+# Schema migrations; MIGRATIONS[n] upgrades the database from version n to n + 1.
+# Only ever append to this list.
+MIGRATIONS = [
+    _create_tables,
+    _index_meal_logs_by_user_date,
+    _move_foods_to_items,
+    _create_daily_totals,
+    _index_meal_logs_by_user_id,
+    _add_shared_plan_last_viewed,
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending migrations, one transaction each. Returns the resulting version."""
+    while True:
+        # IMMEDIATE takes the write lock, so concurrent processes apply each step once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = schema_version(conn)
+            if version >= len(MIGRATIONS):
+                conn.rollback()
+                return version
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+            logger.info(f"Database migrated to version {version + 1}")
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def insert_meal_log(conn, user_id, date, totals, items):
+    """Insert one day's plan: a meal_logs row with its totals plus one meal_log_items row per food.
+
+    ``totals`` follows NUTRIENTS order and ``items`` yields tuples in ITEM_COLUMNS order.
+    Returns the new log id.
+    """
+    cur = conn.execute(
+        'INSERT INTO meal_logs (user_id, date, protein, potassium, phosphorus, calories) VALUES (?, ?, ?, ?, ?, ?)',
+        (user_id, date, *map(float, totals))
+    )
+    conn.executemany(
+        f'INSERT INTO meal_log_items (log_id, {", ".join(ITEM_COLUMNS)}) VALUES (?{", ?" * len(ITEM_COLUMNS)})',
+        ((cur.lastrowid, *item) for item in items)
+    )
+    return cur.lastrowid
+
+
+def insert_meal_logs(conn, logs):
+    """Bulk insert_meal_log: ``logs`` yields ``(user_id, date, totals, items)``; returns the count.
+
+    Log ids are reserved up front under a write lock, so any number of logs and their
+    items take two executemany calls.
+    """
+    logs = list(logs)
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    next_id = conn.execute(
+        "SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'meal_logs'), 0), "
+        "COALESCE((SELECT MAX(id) FROM meal_logs), 0)) + 1"
+    ).fetchone()[0]
+    conn.executemany(
+        'INSERT INTO meal_logs (id, user_id, date, protein, potassium, phosphorus, calories) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        ((next_id + n, user_id, date, *map(float, totals)) for n, (user_id, date, totals, _) in enumerate(logs))
+    )
+    conn.executemany(
+        f'INSERT INTO meal_log_items (log_id, {", ".join(ITEM_COLUMNS)}) VALUES (?{", ?" * len(ITEM_COLUMNS)})',
+        ((next_id + n, *item) for n, (_, _, _, items) in enumerate(logs) for item in items)
+    )
+    return len(logs)
+
+
+def snapshot_daily_totals(conn, days):
+    """The daily_totals rows present for ``days``, (user_id, date) pairs, as full rows."""
+    rows = []
+    for user_id, date in days:
+        row = conn.execute('SELECT * FROM daily_totals WHERE user_id = ? AND date = ?', (user_id, date)).fetchone()
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+def restore_daily_totals(conn, rows):
+    """Put back rows taken by snapshot_daily_totals, undoing what inserts since then added to them."""
+    conn.executemany(
+        'INSERT OR REPLACE INTO daily_totals (user_id, date, meals, protein, potassium, phosphorus, calories) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        rows
+    )
+
+
+def insert_shared_plan(conn, share_id, user_id, foods, created_at):
+    """Store a shared plan under its content id; sharing an already stored plan only refreshes its time.
+
+    ``created_at`` is thus the last time the plan was shared; retention expires plans
+    neither shared nor viewed since its cutoff.
+    """
+    conn.execute(
+        'INSERT INTO shared_plans (id, user_id, foods, created_at) VALUES (?, ?, ?, ?) '
+        'ON CONFLICT (id) DO UPDATE SET created_at = MAX(created_at, excluded.created_at)',
+        (share_id, user_id, foods, created_at)
+    )
+    return share_id
+
+
+def record_shared_plan_view(conn, share_id, viewed_on):
+    """Mark a shared plan as viewed on ``viewed_on``, an ISO date."""
+    conn.execute(
+        'UPDATE shared_plans SET last_viewed = ? WHERE id = ? AND (last_viewed IS NULL OR last_viewed < ?)',
+        (viewed_on, share_id, viewed_on)
+    )
+
+
+def fetch_shared_plan(conn, share_id):
+    """The stored plan JSON, or None if there is no such shared plan."""
+    row = conn.execute('SELECT foods FROM shared_plans WHERE id = ?', (share_id,)).fetchone()
+    return row[0] if row else None
+
+
+# SQL expression for the start of each bucket, given an ISO ``date`` column
+BUCKETS = {
+    "day": "date",
+    "week": "date(date, '-6 days', 'weekday 1')",
+    "month": "substr(date, 1, 7) || '-01'",
+}
+
+
+def fetch_period_totals(conn, user_id, start, end, bucket="day"):
+    """(bucket start, meals, protein, potassium, phosphorus, calories) rows from the daily rollup.
+
+    ``bucket`` is a BUCKETS key; coarser buckets keep long ranges to a few rows.
+    """
+    expr = BUCKETS[bucket]
+    return conn.execute(
+        f'SELECT {expr} AS bucket, SUM(meals), SUM(protein), SUM(potassium), SUM(phosphorus), SUM(calories) '
+        'FROM daily_totals WHERE user_id = ? AND date BETWEEN ? AND ? GROUP BY bucket ORDER BY bucket',
+        (user_id, start, end)
+    ).fetchall()
+
+
+def fetch_last_log_id(conn, user_id):
+    """Id of the user's most recent log (0 if none); changes whenever they log a meal."""
+    return conn.execute('SELECT COALESCE(MAX(id), 0) FROM meal_logs WHERE user_id = ?', (user_id,)).fetchone()[0]
+
+
+def fetch_log_dates(conn, user_id, start, end):
+    """Dates with at least one log between two ISO dates, inclusive, newest first."""
+    return [row[0] for row in conn.execute(
+        'SELECT date FROM daily_totals WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date DESC',
+        (user_id, start, end)
+    )]
+
+
+def fetch_meal_log_items(conn, user_id, start, end, schemas=("main",)):
+    """All foods logged between two ISO dates, inclusive, as one DataFrame.
+
+    ``schemas`` names the attached databases to read, e.g. main plus partition files.
+    """
+    query = " UNION ALL ".join(
+        f'SELECT i.log_id, l.date, {", ".join("i." + col for col in ITEM_COLUMNS)}, i.id AS item_id '
+        f'FROM {schema}.meal_logs l JOIN {schema}.meal_log_items i ON i.log_id = l.id '
+        'WHERE l.user_id = ? AND l.date BETWEEN ? AND ?'
+        for schema in schemas
+    )
+    return pd.read_sql_query(
+        f'{query} ORDER BY date, log_id, item_id', conn, params=(user_id, start, end) * len(schemas)
+    ).drop(columns="item_id")
+
+
+# Columns of a flattened history row: the log, its totals, then one of its foods
+HISTORY_COLUMNS = ("log_id", "user_id", "date", "total_protein", "total_potassium", "total_phosphorus", "total_calories",
+                   *ITEM_COLUMNS)
+
+
+def iter_meal_history(conn, user_id=None, start=None, end=None, batch_size=10_000, max_id=None):
+    """Lists of up to ``batch_size`` HISTORY_COLUMNS rows, one per logged food, in log order.
+
+    Rows are read from the cursor a batch at a time, so memory stays bounded for any
+    history size. A log without foods yields one row with empty food columns. Filters
+    left as None select every user, date and log id.
+    """
+    filters, params = [], []
+    for condition, value in (("l.user_id = ?", user_id), ("l.date >= ?", start), ("l.date <= ?", end),
+                             ("l.id <= ?", max_id)):
+        if value is not None:
+            filters.append(condition)
+            params.append(value)
+    cur = conn.execute(
+        "SELECT l.id, COALESCE(l.user_id, 'guest'), l.date, l.protein, l.potassium, l.phosphorus, l.calories, "
+        f'{", ".join("i." + col for col in ITEM_COLUMNS)} '
+        'FROM meal_logs l LEFT JOIN meal_log_items i ON i.log_id = l.id '
+        f'{"WHERE " + " AND ".join(filters) if filters else ""} ORDER BY l.id, i.id',
+        params
+    )
+    while rows := cur.fetchmany(batch_size):
+        yield rows
+
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections to one database file.
+
+    The schema is migrated once, when the pool is created.
+    """
+
+    def __init__(self, path, size=8):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+        conn = self._connect()
+        try:
+            migrate(conn)
+        except Exception:
+            conn.close()
+            raise
+        self._release(conn)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, factory=metrics.connection_factory())
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def dedicated(self):
+        """A new connection outside the pool, for a long-lived owner such as the write-behind thread."""
+        return self._connect()
+
+    def _release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success and rolls back on error."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,45 @@
+"""Chart downsampling: keep the points that preserve a series' visual shape."""
+
+import numpy as np
+
+
+def lttb(y, n, x=None):
+    """Indices of ``n`` points of ``y`` chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; every bucket in between contributes the
+    point forming the largest triangle with the previously kept point and the mean of
+    the next bucket.
+    """
+    length = len(y)
+    if n >= length or n < 3:
+        return np.arange(length)
+    y = np.asarray(y, dtype=np.float64)
+    x = np.arange(length, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    # n - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, length - 1, n - 1).astype(np.intp)
+    indices = np.empty(n, dtype=np.intp)
+    indices[0], indices[-1] = 0, length - 1
+    kept = 0
+    for bucket in range(n - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        if bucket == n - 3:
+            next_x, next_y = x[-1], y[-1]
+        else:
+            next_stop = edges[bucket + 2]
+            next_x, next_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        area = np.abs(
+            (x[kept] - next_x) * (y[start:stop] - y[kept])
+            - (x[kept] - x[start:stop]) * (next_y - y[kept])
+        )
+        kept = start + int(np.argmax(area))
+        indices[bucket + 1] = kept
+    return indices
+
+
+def downsample(frame, columns, n):
+    """Rows of ``frame`` kept so that no more than ``n`` remain: the union of each column's LTTB points."""
+    if len(frame) <= n:
+        return frame
+    per_column = max(3, n // len(columns))
+    rows = np.unique(np.concatenate([lttb(frame[column].to_numpy(), per_column) for column in columns]))
+    return frame.iloc[rows]
@@ -0,0 +1,239 @@
+"""Headless meal plan engine: evaluate, save and export plans for many patients in bulk.
+
+A plan request is a dict with ``patient_id``, an optional ``date`` (ISO, defaults to today)
+and either ``items`` (a list of ``{"food", "category", "portion"}``, portion in grams) or a
+template-shaped ``plan`` (``{meal: [items]}``).
+"""
+
+import concurrent.futures
+import datetime
+import functools
+import itertools
+import json
+import logging
+import os
+import sys
+
+import pandas as pd
+
+from catalog import FoodCatalog, NUTRIENTS
+from data import food_data, DRI
+from db import ITEM_COLUMNS, insert_meal_logs
+from exports import plan_csv, plan_pdf
+from nutrition import batch_totals, evaluate, item_nutrients
+
+CHUNK_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+@functools.cache
+def get_catalog():
+    return FoodCatalog.from_food_data(food_data)
+
+
+def _item_problem(item):
+    if not isinstance(item, dict):
+        return "an item is not an object"
+    missing = [key for key in ("category", "food", "portion") if key not in item]
+    if missing:
+        return f"an item is missing {', '.join(missing)}"
+    if not isinstance(item["portion"], (int, float)) or isinstance(item["portion"], bool) or item["portion"] < 0:
+        return f"invalid portion {item['portion']!r}"
+    return None
+
+
+def request_problem(request):
+    """Why a plan request cannot be evaluated, or None if it is valid."""
+    if not isinstance(request, dict):
+        return "not an object"
+    if "patient_id" not in request:
+        return "no patient_id"
+    if "date" in request:
+        try:
+            datetime.date.fromisoformat(request["date"])
+        except (TypeError, ValueError):
+            return f"invalid date {request['date']!r}"
+    if "items" in request:
+        items = request["items"]
+    else:
+        plan = request.get("plan", {})
+        if not isinstance(plan, dict) or not all(isinstance(meal, list) for meal in plan.values()):
+            return "plan is not an object of item lists"
+        items = [item for meal in plan.values() for item in meal]
+    if not isinstance(items, list):
+        return "items is not a list"
+    return next(filter(None, map(_item_problem, items)), None)
+
+
+def read_requests(path):
+    """Plan requests from a JSON Lines file (``-`` for stdin), one per line.
+
+    Lines that are not valid JSON or not a valid request are skipped, each reported as a
+    warning, so one bad line does not stop a bulk run.
+    """
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping request on line {number}: invalid JSON ({e})")
+                continue
+            problem = request_problem(request)
+            if problem:
+                logger.warning(f"Skipping request on line {number}: {problem}")
+                continue
+            yield request
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def request_items(request):
+    if "items" in request:
+        return request["items"]
+    return [item for items in request.get("plan", {}).values() for item in items]
+
+
+def evaluate_requests(requests, dri=DRI):
+    """Evaluate a list of valid plan requests (see request_problem) with one batched matrix product.
+
+    Each result holds the patient, date, per-nutrient totals, % of DRI, the nutrients
+    flagged low/high (recommendation) and over (warning), the logged items as
+    ITEM_COLUMNS tuples and any foods not found in the catalog.
+    """
+    catalog = get_catalog()
+    today = datetime.date.today().isoformat()
+    resolved = []
+    for request in requests:
+        items = request_items(request)
+        resolved.append(catalog.resolve(items) + (
+            [f"{item['category']}/{item['food']}" for item in items if catalog.lookup(item["category"], item["food"]) is None],
+        ))
+    evaluation = evaluate(batch_totals(catalog, [(ids, portions) for ids, portions, _ in resolved]), dri)
+    results = []
+    for n, (request, (ids, portions, unknown)) in enumerate(zip(requests, resolved)):
+        nutrients = item_nutrients(catalog, ids, portions)
+        results.append({
+            "patient_id": str(request["patient_id"]),
+            "date": request.get("date", today),
+            "totals": dict(zip(NUTRIENTS, evaluation.totals[n].tolist())),
+            "percent": dict(zip(NUTRIENTS, evaluation.percent[n].tolist())),
+            "low": [nutrient for nutrient, flag in zip(NUTRIENTS, evaluation.low[n]) if flag],
+            "high": [nutrient for nutrient, flag in zip(NUTRIENTS, evaluation.high[n]) if flag],
+            "over": [nutrient for nutrient, flag in zip(NUTRIENTS, evaluation.over[n]) if flag],
+            "items": [
+                (catalog.categories[i], catalog.names[i], portion / 100, *row)
+                for i, portion, row in zip(ids.tolist(), portions.tolist(), nutrients.tolist())
+            ],
+            "unknown": unknown,
+        })
+    return results
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _map_chunks(func, requests, workers, chunk_size):
+    """Apply ``func`` to chunks of requests, in order, across a process pool when ``workers != 1``."""
+    chunks = _chunks(requests, chunk_size)
+    if workers == 1:
+        yield from map(func, chunks)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # Keep a bounded number of chunks in flight so huge inputs stream through
+        pending = []
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= 2 * (workers or os.cpu_count() or 1):
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def evaluate_all(requests, workers=None, chunk_size=CHUNK_SIZE):
+    """Evaluate any number of plan requests; yields results in input order."""
+    for results in _map_chunks(evaluate_requests, requests, workers, chunk_size):
+        yield from results
+
+
+def save_results(pool, results, batch_size=CHUNK_SIZE):
+    """Insert evaluated plans into meal_logs in batches, one transaction per batch.
+
+    Plans naming foods not in the catalog are rejected rather than logged with partial
+    (or zero) totals; each is reported as a warning. Returns ``(saved, rejected)``.
+    """
+    saved = rejected = 0
+    for batch in _chunks(results, batch_size):
+        accepted = []
+        for result in batch:
+            if result["unknown"]:
+                logger.warning(f"Not saving plan for {result['patient_id']} on {result['date']}: "
+                               f"unknown foods {', '.join(result['unknown'])}")
+                rejected += 1
+            else:
+                accepted.append(result)
+        if not accepted:
+            continue
+        with pool.connection() as conn:
+            saved += insert_meal_logs(
+                conn,
+                ((r["patient_id"], r["date"], [r["totals"][n] for n in NUTRIENTS], r["items"]) for r in accepted)
+            )
+    return saved, rejected
+
+
+def result_frame(result):
+    return pd.DataFrame(result["items"], columns=list(ITEM_COLUMNS))
+
+
+def export_filename(result, fmt, number):
+    """``<patient>_<date>_<number>.<fmt>``; ``number`` is the request's position in the input,
+    so plans for the same patient and day never share a file."""
+    safe_id = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in result["patient_id"])
+    return f"{safe_id}_{result['date']}_{number}.{fmt}"
+
+
+def export_results(results, out_dir, fmt, numbers):
+    """Write one CSV or PDF per evaluated plan into ``out_dir``, named by ``numbers``; returns the paths."""
+    paths = []
+    for result, number in zip(results, numbers):
+        frame = result_frame(result)
+        path = os.path.join(out_dir, export_filename(result, fmt, number))
+        if fmt == "pdf":
+            with open(path, "wb") as f:
+                f.write(plan_pdf(frame))
+        else:
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(plan_csv(frame))
+        paths.append(path)
+    return paths
+
+
+def _evaluate_and_export(out_dir, fmt, numbered):
+    numbers, requests = zip(*numbered)
+    results = evaluate_requests(list(requests))
+    export_results(results, out_dir, fmt, numbers)
+    return results
+
+
+def export_all(requests, out_dir, fmt, workers=None, chunk_size=CHUNK_SIZE):
+    """Evaluate and export any number of plan requests, building files in the worker processes.
+
+    Files are numbered by request position (from 1), so workers never write the same file.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    func = functools.partial(_evaluate_and_export, out_dir, fmt)
+    for results in _map_chunks(func, enumerate(requests, 1), workers, chunk_size):
+        yield from results
+
+
+def json_result(result):
+    """JSON-friendly view of a result, without the raw item tuples."""
+    return {key: value for key, value in result.items() if key != "items"}
@@ -0,0 +1,119 @@
+"""CSV/PDF exports, built on demand and cached by content hash."""
+
+import functools
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+FONT_NAME = "NotoSansArabic"
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "NotoSansArabic-Regular.ttf")
+FONT_SIZE = 12
+TEXT_X = 500
+TITLE_Y = 750
+FIRST_LINE_Y = 700
+PAGE_TOP_Y = 750
+PAGE_BOTTOM_Y = 50
+LINE_HEIGHT = 20
+SECTION_GAP = 10
+
+
+@functools.cache
+def register_font(path=FONT_PATH):
+    """Parse and register the Arabic PDF font; later calls are free."""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    pdfmetrics.registerFont(TTFont(FONT_NAME, path))
+
+
+def content_key(*parts):
+    """Stable hash of the values an export is built from."""
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+
+class ExportCache:
+    """Thread-safe LRU of built export files (bytes or str), keyed by content hash."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data
+
+    def get_or_build(self, key, build):
+        data = self.get(key)
+        if data is None:
+            data = self.put(key, build())
+        return data
+
+
+def food_lines(frame):
+    return [
+        f"{food} ({portion*100} جم): {calories:.1f} كيلو كالوري"
+        for food, portion, calories in zip(frame["food"], frame["portion"], frame["calories"])
+    ]
+
+
+def lines_pdf(title, lines):
+    """Render a title plus text lines, starting a new page whenever the bottom margin is reached.
+
+    A ``None`` line inserts a small gap between sections.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    register_font()
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    pdf.setFont(FONT_NAME, FONT_SIZE)
+    pdf.drawString(TEXT_X, TITLE_Y, title)
+    y = FIRST_LINE_Y
+    for line in lines:
+        if line is None:
+            y -= SECTION_GAP
+            continue
+        if y < PAGE_BOTTOM_Y:
+            pdf.showPage()
+            pdf.setFont(FONT_NAME, FONT_SIZE)
+            y = PAGE_TOP_Y
+        pdf.drawString(TEXT_X, y, line)
+        y -= LINE_HEIGHT
+    pdf.save()
+    return buffer.getvalue()
+
+
+def plan_csv(frame):
+    return frame.to_csv(index=False)
+
+
+def plan_pdf(frame):
+    return lines_pdf("خطة النظام الغذائي", food_lines(frame))
+
+
+def logs_csv(df_logs):
+    return df_logs.to_csv(index=False)
+
+
+def logs_pdf(period, items):
+    """``items`` holds the period's logged foods, with a ``date`` column."""
+    def lines():
+        for date, day_items in items.groupby("date", sort=False):
+            yield f"التاريخ: {date}"
+            yield from food_lines(day_items)
+            yield None
+    return lines_pdf(f"سجل الوجبات ({period})", lines())
@@ -0,0 +1,214 @@
+"""Database upkeep: log archival, shared plan expiry, partitioning and vacuuming.
+
+Old logs can leave the working database two ways. Compaction writes them to a Parquet
+archive and deletes them. Partitioning moves them into per-year or per-user SQLite files
+that ``attached_partitions`` attaches when a query reaches back that far. Either way
+their days keep their daily_totals rows, so the tracker's summaries and trends are
+unchanged.
+"""
+
+import contextlib
+import datetime
+import hashlib
+import logging
+import os
+
+import transfer
+from db import ConnectionPool, iter_meal_history
+
+logger = logging.getLogger(__name__)
+
+# Logs deleted per transaction, so app writes are never blocked for long
+DELETE_BATCH = 5_000
+# SQLite attaches at most 10 databases by default
+MAX_PARTITIONS = 9
+# Rows sampled per index by ANALYZE
+ANALYSIS_LIMIT = 1000
+# SQL for the partition a meal_logs row belongs to
+PARTITION_KEYS = {
+    "year": "substr(date, 1, 4)",
+    "user": "COALESCE(user_id, 'guest')",
+}
+_LOG_COLUMNS = "id, user_id, date, foods, protein, potassium, phosphorus, calories"
+_INCREMENTAL = 2
+
+
+def cutoff_date(days, today=None):
+    """ISO date ``days`` days before today; logs dated before it count as old."""
+    return ((today or datetime.date.today()) - datetime.timedelta(days=days)).isoformat()
+
+
+def _delete_logs(pool, condition, params):
+    """Delete the meal_logs rows (and, by cascade, their items) matching ``condition``; returns the count."""
+    deleted = 0
+    while True:
+        with pool.connection() as conn:
+            count = conn.execute(
+                f'DELETE FROM meal_logs WHERE id IN (SELECT id FROM meal_logs WHERE {condition} LIMIT ?)',
+                (*params, DELETE_BATCH)
+            ).rowcount
+        deleted += count
+        if count < DELETE_BATCH:
+            return deleted
+
+
+def compact_logs(pool, archive_dir, before, batch_size=transfer.BATCH_SIZE):
+    """Move logs dated before ``before`` into a Parquet archive in ``archive_dir``.
+
+    The archive is named after the first and last log ids it holds and can be loaded
+    back with ``transfer.import_history(..., restore=True)``, which leaves the daily_totals
+    rows the archived logs still count in unchanged. Logs are only deleted once it is written.
+    Returns ``(logs archived, archive path or None)``.
+    """
+    with pool.connection() as conn:
+        first, last, count = conn.execute(
+            'SELECT MIN(id), MAX(id), COUNT(*) FROM meal_logs WHERE date < ?', (before,)
+        ).fetchone()
+    if not count:
+        return 0, None
+    os.makedirs(archive_dir, exist_ok=True)
+    name = f"meal_logs_{first}-{last}.parquet"
+    path = os.path.join(archive_dir, name)
+    tmp = os.path.join(archive_dir, f".{name}")
+    end = (datetime.date.fromisoformat(before) - datetime.timedelta(days=1)).isoformat()
+    try:
+        with pool.connection() as conn:
+            transfer.write_parquet(tmp, iter_meal_history(conn, end=end, batch_size=batch_size, max_id=last))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    # Logs inserted meanwhile have larger ids, so exactly the archived logs are deleted
+    deleted = _delete_logs(pool, 'date < ? AND id <= ?', (before, last))
+    logger.info(f"Archived {deleted} meal logs dated before {before} to {path}")
+    return deleted, path
+
+
+def expire_shared_plans(pool, before):
+    """Delete plans neither shared nor viewed since ``before``, an ISO date; returns the count."""
+    with pool.connection() as conn:
+        count = conn.execute(
+            'DELETE FROM shared_plans WHERE created_at < ? AND (last_viewed IS NULL OR last_viewed < ?)',
+            (before, before)
+        ).rowcount
+    logger.info(f"Expired {count} shared plans unused since {before}")
+    return count
+
+
+def partition_file(partition_dir, by, key):
+    """Path of the partition database for ``key``, a year or a user id."""
+    if by == "year":
+        return os.path.join(partition_dir, f"meal_logs_{key}.db")
+    safe_id = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in key)
+    # Distinct ids may share a sanitized name; the digest keeps their files apart
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=4).hexdigest()
+    return os.path.join(partition_dir, f"meal_logs_user_{safe_id}_{digest}.db")
+
+
+def partition_logs(pool, partition_dir, before, by="year"):
+    """Move logs dated before ``before`` into one database file per year or per user.
+
+    Rows are copied with their ids, committed, then deleted from the working database,
+    so an interrupted run only leaves copies that the next run skips. Returns
+    ``{partition path: logs moved}``.
+    """
+    key = PARTITION_KEYS[by]
+    with pool.connection() as conn:
+        last = conn.execute('SELECT MAX(id) FROM meal_logs WHERE date < ?', (before,)).fetchone()[0]
+        keys = [row[0] for row in conn.execute(
+            f'SELECT DISTINCT {key} FROM meal_logs WHERE date < ? AND id <= ?', (before, last)
+        )] if last else []
+    os.makedirs(partition_dir, exist_ok=True)
+    moved = {}
+    condition = f'date < ? AND id <= ? AND {key} = ?'
+    for value in keys:
+        path = partition_file(partition_dir, by, value)
+        # Creates the file with the current schema, or migrates an older one
+        ConnectionPool(path, size=1).close()
+        params = (before, last, value)
+        with pool.connection() as conn:
+            conn.execute("ATTACH DATABASE ? AS part", (path,))
+            try:
+                conn.execute(
+                    f'INSERT OR IGNORE INTO part.meal_logs ({_LOG_COLUMNS}) '
+                    f'SELECT {_LOG_COLUMNS} FROM main.meal_logs WHERE {condition}', params
+                )
+                conn.execute(
+                    'INSERT OR IGNORE INTO part.meal_log_items SELECT * FROM main.meal_log_items '
+                    f'WHERE log_id IN (SELECT id FROM main.meal_logs WHERE {condition})', params
+                )
+                conn.commit()
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                conn.execute("DETACH DATABASE part")
+        moved[path] = _delete_logs(pool, condition, params)
+        logger.info(f"Moved {moved[path]} meal logs to partition {path}")
+    return moved
+
+
+@contextlib.contextmanager
+def attached_partitions(conn, partition_dir, user_id, start, end):
+    """Attach the partition files that can hold ``user_id``'s logs between two ISO dates.
+
+    Yields the schema names to read, ``main`` first, for ``fetch_meal_log_items``;
+    the partitions are detached on exit.
+    """
+    candidates = [partition_file(partition_dir, "year", str(year)) for year in range(int(start[:4]), int(end[:4]) + 1)]
+    candidates.append(partition_file(partition_dir, "user", user_id))
+    paths = [path for path in candidates if os.path.exists(path)]
+    if len(paths) > MAX_PARTITIONS:
+        logger.warning(f"Reading only {MAX_PARTITIONS} of {len(paths)} partitions for {start} to {end}")
+        paths = paths[:MAX_PARTITIONS]
+    schemas = ["main"]
+    try:
+        for n, path in enumerate(paths):
+            conn.execute(f"ATTACH DATABASE ? AS part{n}", (path,))
+            schemas.append(f"part{n}")
+        yield schemas
+    finally:
+        for schema in schemas[1:]:
+            conn.execute(f"DETACH DATABASE {schema}")
+
+
+def vacuum(pool, pages=None):
+    """Return free pages to the filesystem, refresh planner statistics and truncate the WAL.
+
+    Releases at most ``pages`` pages (all when None). A database created before
+    incremental auto-vacuum was enabled gets one full VACUUM to convert it.
+    Returns the number of pages released.
+    """
+    with pool.connection() as conn:
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != _INCREMENTAL:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        else:
+            # execute() steps a statement without result columns once, freeing a single
+            # page; executescript() runs it to completion
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages) if pages else 0})")
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        # Counted from the free list: converting adds pointer-map pages, so the page count can grow
+        released = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    logger.info(f"Vacuum released {released} pages")
+    return released
+
+
+def run_maintenance(pool, archive_dir=None, archive_after=None, shares_after=None,
+                    partition_dir=None, partition_after=None, partition_by="year", vacuum_pages=None):
+    """Run the configured steps, each enabled by its age in days, then vacuum; returns a summary dict.
+
+    Partitioning runs before compaction, so logs old enough for both are partitioned.
+    """
+    summary = {}
+    if partition_dir and partition_after is not None:
+        summary["partitioned"] = sum(partition_logs(pool, partition_dir, cutoff_date(partition_after), partition_by).values())
+    if archive_dir and archive_after is not None:
+        summary["archived"], summary["archive"] = compact_logs(pool, archive_dir, cutoff_date(archive_after))
+    if shares_after is not None:
+        summary["expired_shares"] = expire_shared_plans(pool, cutoff_date(shares_after))
+    summary["released_pages"] = vacuum(pool, vacuum_pages)
+    return summary
@@ -0,0 +1,256 @@
+"""In-process timing metrics: spans around app sections and every SQLite statement.
+
+Timings go into fixed-bucket histograms shared by all sessions, readable as p50/p95/p99
+summaries or as Prometheus text. Metrics are off until ``configure(True)``; while off,
+``span`` returns a shared no-op context manager and pools open plain connections.
+"""
+
+import bisect
+import functools
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+PREFIX = "mealplan"
+# Bucket upper bounds in seconds: 10 µs to about 100 s, growing by √2
+BOUNDS = tuple(1e-5 * 2 ** (i / 2) for i in range(47))
+QUANTILES = (0.5, 0.95, 0.99)
+# Histogram families: (kind, help text, label name)
+FAMILIES = {
+    "span": ("Time spent in instrumented app sections.", "section"),
+    "db": ("Time spent executing SQLite statements.", "statement"),
+}
+
+logger = logging.getLogger(__name__)
+
+_enabled = False
+_histograms = {}
+_lock = threading.Lock()
+_exporter = None
+
+
+class Histogram:
+    """Thread-safe counts of observations per bucket, plus their sum and maximum."""
+
+    def __init__(self):
+        self._counts = [0] * (len(BOUNDS) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        bucket = bisect.bisect_left(BOUNDS, seconds)
+        with self._lock:
+            self._counts[bucket] += 1
+            self._sum += seconds
+            if seconds > self._max:
+                self._max = seconds
+
+    def snapshot(self):
+        """``(counts, sum, max)`` read under the lock."""
+        with self._lock:
+            return list(self._counts), self._sum, self._max
+
+
+def quantile(counts, maximum, q):
+    """Estimate a quantile by interpolating inside the bucket it falls in."""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for bucket, count in enumerate(counts):
+        if count and seen + count >= rank:
+            lower = BOUNDS[bucket - 1] if bucket else 0.0
+            upper = min(BOUNDS[bucket], maximum) if bucket < len(BOUNDS) else maximum
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return maximum
+
+
+def configure(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def enabled():
+    return _enabled
+
+
+def observe(kind, name, seconds):
+    histogram = _histograms.get((kind, name))
+    if histogram is None:
+        with _lock:
+            histogram = _histograms.setdefault((kind, name), Histogram())
+    histogram.observe(seconds)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def _sorted_histograms():
+    with _lock:
+        return sorted(_histograms.items())
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe("span", self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """Context manager timing one app section under ``name``."""
+    return _Span(name) if _enabled else _NO_SPAN
+
+
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|INDEX)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(\w+)", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1024)
+def statement_label(sql):
+    """Low-cardinality name for a statement: its verb and first table, e.g. ``SELECT meal_logs``."""
+    words = sql.split(None, 1)
+    if not words:
+        return "EMPTY"
+    table = _TABLE.search(sql)
+    return f"{words[0].upper()} {table.group(1)}" if table else words[0].upper()
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            observe("db", statement_label(sql), time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            observe("db", statement_label(sql), time.perf_counter() - start)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose statements, including those run through its cursors, are timed."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory():
+    """``sqlite3.connect`` factory for new connections: timed only while metrics are on."""
+    return TimedConnection if _enabled else sqlite3.Connection
+
+
+def summary():
+    """One row per histogram: kind, name, count and mean/p50/p95/p99/max in milliseconds."""
+    rows = []
+    for (kind, name), histogram in _sorted_histograms():
+        counts, total, maximum = histogram.snapshot()
+        count = sum(counts)
+        row = {"kind": kind, "name": name, "count": count, "mean_ms": total / count * 1000 if count else 0.0}
+        for q in QUANTILES:
+            row[f"p{round(q * 100)}_ms"] = quantile(counts, maximum, q) * 1000
+        row["max_ms"] = maximum * 1000
+        rows.append(row)
+    return rows
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    """All histograms in the Prometheus text exposition format."""
+    lines = []
+    by_kind = {}
+    for (kind, name), histogram in _sorted_histograms():
+        by_kind.setdefault(kind, []).append((name, histogram.snapshot()))
+    for kind, entries in by_kind.items():
+        help_text, label = FAMILIES[kind]
+        metric = f"{PREFIX}_{kind}_seconds"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, (counts, total, _) in entries:
+            labels = f'{label}="{_escape(name)}"'
+            cumulative = 0
+            for bound, count in zip(BOUNDS, counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{labels}}} {total:.9g}")
+            lines.append(f"{metric}_count{{{labels}}} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Atomically replace ``path`` with the current Prometheus text, for a textfile collector."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".prom")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(prometheus_text())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def start_exporter(path, interval=15.0):
+    """Rewrite the Prometheus file every ``interval`` seconds from a daemon thread.
+
+    Only one exporter runs per process; later calls return the running thread.
+    """
+    global _exporter
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_prometheus(path)
+            except OSError as e:
+                logger.warning(f"Metrics export to {path} failed: {e}")
+
+    with _lock:
+        if _exporter is None or not _exporter.is_alive():
+            _exporter = threading.Thread(target=loop, name="metrics-exporter", daemon=True)
+            _exporter.start()
+        return _exporter
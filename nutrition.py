@@ -0,0 +1,76 @@
+"""Vectorized nutrient math: portion vectors times the catalog nutrient matrix."""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from catalog import NUTRIENTS
+
+_NAN = np.nan
+
+# Recommendation thresholds as fractions of the DRI, in NUTRIENTS order (nan = no check)
+LOW_FACTORS = np.array([0.8, _NAN, _NAN, 0.8])
+HIGH_FACTORS = np.array([_NAN, 0.9, 0.9, _NAN])
+# Warn once the DRI itself is exceeded
+LIMIT_FACTORS = np.array([1.0, 1.0, 1.0, _NAN])
+
+Evaluation = namedtuple("Evaluation", ["totals", "percent", "low", "high", "over"])
+
+
+def dri_vector(dri):
+    return np.array([dri[n] for n in NUTRIENTS], dtype=np.float64)
+
+
+def item_nutrients(catalog, ids, portions):
+    """Nutrients of each selected item, ``portions`` in grams. Shape ``(k, len(NUTRIENTS))``."""
+    return catalog.nutrients[ids] * (np.asarray(portions, dtype=np.float64) / 100)[:, None]
+
+
+def plan_totals(catalog, ids, portions):
+    """Total nutrients of one plan as a single vector-matrix product."""
+    return (np.asarray(portions, dtype=np.float64) / 100) @ catalog.nutrients[ids]
+
+
+def batch_totals(catalog, plans):
+    """Totals for many ``(ids, portions)`` plans at once. Shape ``(len(plans), len(NUTRIENTS))``.
+
+    Plans are packed into a portion matrix over the foods they actually use,
+    so the cost does not depend on the catalog size.
+    """
+    if not plans:
+        return np.zeros((0, len(NUTRIENTS)))
+    ids = np.concatenate([np.asarray(p[0], dtype=np.intp) for p in plans])
+    portions = np.concatenate([np.asarray(p[1], dtype=np.float64) for p in plans])
+    rows = np.repeat(np.arange(len(plans)), [len(p[0]) for p in plans])
+    used, cols = np.unique(ids, return_inverse=True)
+    matrix = np.zeros((len(plans), len(used)))
+    np.add.at(matrix, (rows, cols), portions / 100)
+    return matrix @ catalog.nutrients[used]
+
+
+def evaluate(totals, dri):
+    """% of DRI and recommendation/warning flags for one totals vector or a batch of them."""
+    totals = np.asarray(totals, dtype=np.float64)
+    limits = dri_vector(dri)
+    return Evaluation(
+        totals=totals,
+        percent=totals / limits * 100,
+        low=totals < limits * LOW_FACTORS,
+        high=totals > limits * HIGH_FACTORS,
+        over=totals > limits * LIMIT_FACTORS,
+    )
+
+
+def selection_frame(catalog, ids, portions):
+    """Selected foods as a DataFrame with the columns the app displays and saves."""
+    ids = np.asarray(ids, dtype=np.intp)
+    portions = np.asarray(portions, dtype=np.float64)
+    frame = pd.DataFrame({
+        "food": [catalog.names[i] for i in ids],
+        "category": [catalog.categories[i] for i in ids],
+        "portion": portions / 100,
+    })
+    frame[list(NUTRIENTS)] = item_nutrients(catalog, ids, portions)
+    frame["tags"] = [list(catalog.tags[i]) for i in ids]
+    return frame
@@ -0,0 +1,235 @@
+"""Meal plan optimizer: DRI-compliant plans from the catalog via linear programming."""
+
+from collections import namedtuple
+
+import numpy as np
+
+from catalog import NUTRIENTS
+from nutrition import HIGH_FACTORS, LIMIT_FACTORS, LOW_FACTORS
+
+# Share of the daily limits given to each meal
+MEAL_SHARES = {
+    "الإفطار": 0.25,
+    "الغداء": 0.40,
+    "العشاء": 0.35
+}
+
+# Per-patient daily limits
+Limits = namedtuple("Limits", ["protein_min", "potassium_max", "phosphorus_max", "calories_target", "calories_tolerance",
+                               "protein_max"])
+
+_PROTEIN, _POTASSIUM, _PHOSPHORUS, _CALORIES = (NUTRIENTS.index(n) for n in ("protein", "potassium", "phosphorus", "calories"))
+
+
+def default_limits(dri):
+    """Limits that pass every DRI check in nutrition.evaluate, so generated plans draw no
+    recommendation or warning: protein within 80-100% of DRI, minerals under 90% of DRI."""
+    return Limits(
+        protein_min=dri["protein"] * LOW_FACTORS[_PROTEIN],
+        potassium_max=dri["potassium"] * HIGH_FACTORS[_POTASSIUM],
+        phosphorus_max=dri["phosphorus"] * HIGH_FACTORS[_PHOSPHORUS],
+        calories_target=dri["calories"],
+        calories_tolerance=0.1,
+        protein_max=dri["protein"] * LIMIT_FACTORS[_PROTEIN]
+    )
+
+
+def candidate_ids(catalog, require_tags=(), exclude_tags=(), categories=None):
+    """Foods the optimizer may choose from."""
+    ids = np.asarray(catalog.filter(require_tags), dtype=np.intp)
+    if exclude_tags:
+        excluded = {i for tag in exclude_tags for i in catalog.filter((tag,))}
+        ids = ids[[i not in excluded for i in ids.tolist()]]
+    if categories is not None:
+        categories = set(categories)
+        ids = ids[[catalog.categories[i] in categories for i in ids.tolist()]]
+    return ids
+
+
+def _mean_cost(catalog, ids, limits):
+    """Average objective cost of 100 g of the foods ``ids``, the scale for soft penalties."""
+    if not len(ids):
+        return 0.0
+    return np.mean(
+        catalog.nutrients[ids, _POTASSIUM] / limits.potassium_max + catalog.nutrients[ids, _PHOSPHORUS] / limits.phosphorus_max
+    )
+
+
+def tag_penalty(catalog, ids, limits, prefer_tags, weight=1.0):
+    """Per-food ``penalty`` favouring foods with ``prefer_tags`` without excluding the rest.
+
+    Each food costs extra in proportion to the share of the preferred tags it lacks, so
+    tags few foods carry (or that no food carries in some category) still leave a plan.
+    """
+    if not prefer_tags:
+        return None
+    missing = np.array([len(set(prefer_tags) - set(catalog.tags[i])) for i in ids.tolist()], dtype=np.float64)
+    return weight * _mean_cost(catalog, ids, limits) * missing / len(prefer_tags)
+
+
+def _floor_value(cost, a_ub, b_ub):
+    """Per-unit-cost contribution of each food to each lower-bounded row (protein, calories,
+    category minimums), one row per floor."""
+    return -a_ub[np.flatnonzero(b_ub < 0)] / np.maximum(cost, 1e-9)
+
+
+def _solve_lp(cost, a_ub, b_ub, upper, working_size=128):
+    """Minimize ``cost @ x`` s.t. ``a_ub @ x <= b_ub``, ``0 <= x <= upper``; returns x or None.
+
+    Large catalogs are solved by column generation: the LP is solved over a small working
+    set of foods, the LP duals price every other food, and foods that would lower the
+    cost are added until none is left. The result is the optimum of the full LP.
+    """
+    from scipy.optimize import linprog
+
+    n = len(cost)
+    if n <= 4 * working_size:
+        result = linprog(cost, A_ub=a_ub, b_ub=b_ub, bounds=(0, upper), method="highs")
+        return result.x if result.status == 0 else None
+
+    # Start with the foods giving the most of each lower-bounded row per unit cost
+    value = _floor_value(cost, a_ub, b_ub)
+    top = np.argpartition(-value, working_size, axis=1)[:, :working_size]
+    working = np.zeros(n, dtype=bool)
+    working[top.ravel()] = True
+    while True:
+        columns = np.flatnonzero(working)
+        result = linprog(cost[columns], A_ub=a_ub[:, columns], b_ub=b_ub, bounds=(0, upper), method="highs")
+        if result.status == 2 and len(columns) < n:
+            # Infeasible over the working set: widen it with the next-best foods
+            value[:, columns] = -np.inf
+            extra = np.argpartition(-value, working_size, axis=1)[:, :working_size]
+            working[extra.ravel()] = True
+            continue
+        if result.status != 0:
+            return None
+        reduced = cost - result.ineqlin.marginals @ a_ub
+        reduced[columns] = 0
+        entering = np.flatnonzero(reduced < -1e-9)
+        if not entering.size:
+            x = np.zeros(n)
+            x[columns] = result.x
+            return x
+        if entering.size > working_size:
+            entering = entering[np.argpartition(reduced[entering], working_size)[:working_size]]
+        working[entering] = True
+
+
+def _solve_steps(cost, a_ub, b_ub, x, max_steps, unit, working_size=128):
+    """Whole numbers of ``unit`` (in x's units) meeting the same constraints as the LP solution ``x``; or None.
+
+    Rounding the LP optimum can break its floors or ceilings, so a small integer program
+    is solved instead: first over the foods the LP chose, then, if that is infeasible,
+    with the foods contributing most to each floor added.
+    """
+    from scipy.optimize import Bounds, LinearConstraint, milp
+
+    n = len(cost)
+    columns = np.flatnonzero(x > 1e-9)
+    if n <= 4 * working_size:
+        wider = np.arange(n)
+    else:
+        value = _floor_value(cost, a_ub, b_ub)
+        top = np.argpartition(-value, working_size, axis=1)[:, :working_size]
+        wider = np.union1d(columns, top.ravel())
+    for columns in (columns, wider):
+        result = milp(
+            cost[columns] * unit,
+            integrality=np.ones(len(columns)),
+            bounds=Bounds(0, max_steps),
+            constraints=LinearConstraint(a_ub[:, columns] * unit, -np.inf, b_ub),
+            options={"time_limit": 5},
+        )
+        if result.x is not None:
+            steps = np.zeros(n)
+            steps[columns] = np.round(result.x)
+            return steps
+    return None
+
+
+def solve_meal(catalog, ids, limits, share=1.0, max_portion=300.0, category_min=None, penalty=None, step=5.0):
+    """Cheapest portions (grams) of foods ``ids`` meeting ``share`` of the daily limits.
+
+    The objective minimizes potassium and phosphorus relative to their ceilings, plus an
+    optional per-food ``penalty`` (used to spread foods across plans). ``category_min``
+    maps a category to the grams it must contribute to the meal. Portions are whole
+    multiples of ``step`` grams that still meet every limit. Returns ``(ids, portions)``
+    of the chosen foods, or None when the limits cannot be met.
+    """
+    nutrients = catalog.nutrients[ids]
+    cost = nutrients[:, _POTASSIUM] / limits.potassium_max + nutrients[:, _PHOSPHORUS] / limits.phosphorus_max
+    if penalty is not None:
+        cost = cost + penalty
+    calories = limits.calories_target * share
+    # x is in units of 100 g, matching the per-100 g nutrient matrix
+    a_ub = np.stack([
+        -nutrients[:, _PROTEIN],
+        nutrients[:, _PROTEIN],
+        nutrients[:, _POTASSIUM],
+        nutrients[:, _PHOSPHORUS],
+        nutrients[:, _CALORIES],
+        -nutrients[:, _CALORIES],
+    ])
+    b_ub = [
+        -limits.protein_min * share,
+        limits.protein_max * share,
+        limits.potassium_max * share,
+        limits.phosphorus_max * share,
+        calories * (1 + limits.calories_tolerance),
+        -calories * (1 - limits.calories_tolerance),
+    ]
+    if category_min:
+        rows = [-np.isin(ids, catalog.category_ids.get(category, ())).astype(np.float64) for category in category_min]
+        a_ub = np.vstack([a_ub, *rows])
+        b_ub += [-grams / 100 for grams in category_min.values()]
+    b_ub = np.array(b_ub)
+    x = _solve_lp(cost, a_ub, b_ub, max_portion / 100)
+    if x is None:
+        return None
+    steps = _solve_steps(cost, a_ub, b_ub, x, np.floor(max_portion / step), step / 100)
+    if steps is None:
+        return None
+    portions = steps * step
+    if np.any(a_ub @ (portions / 100) > b_ub + 1e-6):
+        return None
+    chosen = portions > 0
+    return ids[chosen], portions[chosen]
+
+
+def plan_day(catalog, limits, ids=None, max_portion=300.0, category_min=None, penalty=None):
+    """One day's plan shaped like a meal template: ``{meal: [{"food", "category", "portion"}]}``.
+
+    Returns None when any meal is infeasible.
+    """
+    if ids is None:
+        ids = candidate_ids(catalog)
+    plan = {}
+    for meal, share in MEAL_SHARES.items():
+        solved = solve_meal(catalog, ids, limits, share, max_portion, category_min, penalty)
+        if solved is None:
+            return None
+        plan[meal] = [
+            {"food": catalog.names[i], "category": catalog.categories[i], "portion": float(p)}
+            for i, p in zip(*solved)
+        ]
+    return plan
+
+
+def plan_days(catalog, limits, n_days=7, ids=None, max_portion=300.0, category_min=None, diversity=0.5):
+    """``n_days`` distinct daily plans; foods used on earlier days get costlier by ``diversity``.
+
+    Days that cannot be planned are returned as None.
+    """
+    if ids is None:
+        ids = candidate_ids(catalog)
+    uses = np.zeros(len(ids))
+    scale = diversity * _mean_cost(catalog, ids, limits)
+    position = {food_id: n for n, food_id in enumerate(ids.tolist())}
+    plans = []
+    for _ in range(n_days):
+        plan = plan_day(catalog, limits, ids, max_portion, category_min, penalty=uses * scale)
+        plans.append(plan)
+        for items in (plan or {}).values():
+            for item in items:
+                uses[position[catalog.lookup(item["category"], item["food"])]] += 1
+    return plans
@@ -0,0 +1,175 @@
+"""Arabic-aware food search: orthographic normalization, prefix lookup and n-gram fuzzy matching."""
+
+import bisect
+import re
+
+import numpy as np
+
+# Harakat, Quranic marks, superscript alef and tatweel
+_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+# Letter variants users type interchangeably
+_LETTERS = str.maketrans({
+    "أ": "ا",
+    "إ": "ا",
+    "آ": "ا",
+    "ٱ": "ا",
+    "ة": "ه",
+    "ى": "ي",
+    "ؤ": "و",
+    "ئ": "ي",
+})
+
+# Match tiers, best first; typo matches rank below all of them, by edit distance
+NAME_PREFIX, WORD_PREFIX, SUBSTRING = 3, 2, 1
+
+
+def normalize(text):
+    """Fold diacritics, alef/hamza/taa marbuta/alef maqsura variants, case and spacing."""
+    text = _DIACRITICS.sub("", text).translate(_LETTERS).lower()
+    return " ".join(text.split())
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _closest_distance(query, name, max_edits, distances):
+    """Smallest edit distance between ``query`` and any run of as many words in ``name``.
+
+    Runs whose length alone puts them more than ``max_edits`` away are skipped (and count
+    as ``max_edits + 1``); ``distances`` memoizes runs shared between names.
+    """
+    words = name.split()
+    width = len(query.split())
+    best = max_edits + 1
+    for start in range(max(1, len(words) - width + 1)):
+        run = " ".join(words[start:start + width])
+        if abs(len(run) - len(query)) > max_edits:
+            continue
+        distance = distances.get(run)
+        if distance is None:
+            distance = distances[run] = edit_distance(query, run)
+        best = min(best, distance)
+    return best
+
+
+def ngrams(text, n=3, pad=True):
+    if pad:
+        text = f" {text} "
+    if len(text) < n:
+        return {text} if pad else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class SearchIndex:
+    """Prebuilt index over food names, addressed by the same ids as the catalog."""
+
+    def __init__(self, names, n=3):
+        self.n = n
+        self.normalized = [normalize(name) for name in names]
+        # n-gram postings, plus bigrams for queries too short for n-grams to filter typos
+        self._postings = {}
+        for size in {n, 2}:
+            postings = {}
+            for food_id, name in enumerate(self.normalized):
+                for gram in ngrams(name, size):
+                    postings.setdefault(gram, []).append(food_id)
+            self._postings[size] = {gram: np.array(ids, dtype=np.intp) for gram, ids in postings.items()}
+        # Sorted (key, id) pairs, one per word plus one for the whole name, for prefix lookups
+        entries = sorted(
+            (key, food_id, key == name)
+            for food_id, name in enumerate(self.normalized)
+            for key in {name, *name.split()}
+        )
+        self._prefix_keys = [key for key, _, _ in entries]
+        self._prefix_ids = np.array([food_id for _, food_id, _ in entries], dtype=np.int64)
+        self._prefix_is_name = np.array([is_name for _, _, is_name in entries], dtype=bool)
+        self._lengths = np.array([len(name) for name in self.normalized], dtype=np.int64)
+        self._max_length = int(self._lengths.max(initial=0))
+
+    def _prefix_ranked(self, query):
+        """Ids and tiers of the prefix matches, best first: tier, then shorter names, then id."""
+        start = bisect.bisect_left(self._prefix_keys, query)
+        stop = bisect.bisect_left(self._prefix_keys, query + "\uffff")
+        ids = self._prefix_ids[start:stop]
+        # The whole-name key matches exactly when the name starts with the query
+        tiers = np.where(self._prefix_is_name[start:stop], NAME_PREFIX, WORD_PREFIX)
+        # One sortable key per entry, (tier, length, id) packed into an integer; a food's
+        # first entry in key order is its best
+        n_foods = len(self.normalized)
+        per_tier = (self._max_length + 1) * n_foods
+        keys = np.sort((NAME_PREFIX - tiers) * per_tier + self._lengths[ids] * n_foods + ids)
+        _, first = np.unique(keys % n_foods, return_index=True)
+        keys = keys[np.sort(first)]
+        return (keys % n_foods).tolist(), (NAME_PREFIX - keys // per_tier).tolist()
+
+    def _gram_hits(self, grams, size):
+        """Number of ``grams`` (of ``size`` characters) each food contains."""
+        postings = self._postings[size]
+        lists = [postings[gram] for gram in grams if gram in postings]
+        if not lists:
+            return np.zeros(len(self.normalized))
+        return np.bincount(np.concatenate(lists), minlength=len(self.normalized))
+
+    def _typo_candidates(self, query, max_edits):
+        """Foods that can hold a run of words within ``max_edits`` of ``query``.
+
+        By the q-gram lemma such a run shares at least ``len(grams) - size * max_edits``
+        of the query's grams. Short queries use bigrams, which keep that bound positive.
+        """
+        for size in (self.n, 2):
+            grams = ngrams(query, size)
+            bound = len(grams) - size * max_edits
+            if bound >= 2 or size == 2:
+                break
+        if bound < 1:
+            return []
+        return np.flatnonzero(self._gram_hits(grams, size) >= bound).tolist()
+
+    def prefix(self, query, limit=None):
+        """Foods whose name or one of its words starts with ``query``, best first."""
+        query = normalize(query)
+        if not query:
+            return []
+        return self._prefix_ranked(query)[0][:limit]
+
+    def search(self, query, limit=None):
+        """Ids of matching foods, best first.
+
+        Prefix matches rank first, then substring matches, then typo matches: names with
+        a run of words within a few edits of the query. When ``limit`` prefix matches
+        exist the n-gram pass is skipped.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        ranked, tiers = self._prefix_ranked(query)
+        if limit is not None and len(ranked) >= limit:
+            return ranked[:limit]
+        tiers = dict(zip(ranked, tiers))
+        # Names holding all of the query's grams; queries shorter than n use bigrams, and
+        # single letters, which have no postings, check every name
+        size = min(self.n, len(query))
+        if size in self._postings:
+            inner = ngrams(query, size, pad=False)
+            candidates = np.flatnonzero(self._gram_hits(inner, size) == len(inner)).tolist()
+        else:
+            candidates = range(len(self.normalized))
+        for food_id in candidates:
+            if food_id not in tiers and query in self.normalized[food_id]:
+                tiers[food_id] = SUBSTRING
+        max_edits = max(1, len(query) // 4)
+        distances = {}
+        for food_id in self._typo_candidates(query, max_edits):
+            if food_id not in tiers:
+                distance = _closest_distance(query, self.normalized[food_id], max_edits, distances)
+                if distance <= max_edits:
+                    tiers[food_id] = -distance
+        ranked = sorted(tiers, key=lambda i: (-tiers[i], len(self.normalized[i]), i))
+        return ranked[:limit]
@@ -0,0 +1,66 @@
+"""Per-session food selection, stored compactly as references into the shared catalog."""
+
+import hashlib
+from array import array
+
+import numpy as np
+
+
+class Selection:
+    """Selected foods as typed arrays of catalog ids and portions (grams).
+
+    ``version`` is bumped on every change; ``key()`` identifies the contents and is
+    recomputed only when the version moves, so derived views can be memoized on it.
+    """
+
+    __slots__ = ("ids", "portions", "version", "_key", "_key_version")
+
+    def __init__(self, ids=(), portions=()):
+        self.ids = array("i", ids)
+        self.portions = array("d", portions)
+        self.version = 0
+        self._key = None
+        self._key_version = -1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __bool__(self):
+        return bool(self.ids)
+
+    def _changed(self):
+        self.version += 1
+
+    def add(self, food_id, portion):
+        self.ids.append(int(food_id))
+        self.portions.append(float(portion))
+        self._changed()
+
+    def remove(self, food_id):
+        """Remove every entry of ``food_id``."""
+        kept = [n for n, i in enumerate(self.ids) if i != food_id]
+        self.ids = array("i", (self.ids[n] for n in kept))
+        self.portions = array("d", (self.portions[n] for n in kept))
+        self._changed()
+
+    def replace(self, position, food_id):
+        self.ids[position] = int(food_id)
+        self._changed()
+
+    def clear(self):
+        self.ids = array("i")
+        self.portions = array("d")
+        self._changed()
+
+    def arrays(self):
+        """``(ids, portions)`` as NumPy arrays for the vectorized nutrient functions."""
+        return np.array(self.ids, dtype=np.intp), np.array(self.portions, dtype=np.float64)
+
+    def key(self):
+        """Digest of the contents: equal selections, in any session, share a key."""
+        if self._key_version != self.version:
+            digest = hashlib.blake2b(self.ids.tobytes(), digest_size=16)
+            digest.update(self.portions.tobytes())
+            self._key = digest.hexdigest()
+            self._key_version = self.version
+        return self._key
@@ -0,0 +1,34 @@
+"""Shared plans: canonical plan content and the content-addressed ids it is stored under."""
+
+import hashlib
+import json
+
+# Hex digits of the SHA-256 digest kept in the id (128 bits)
+ID_LENGTH = 32
+
+
+def plan_items(catalog, ids, portions):
+    """A plan as ``{"category", "food", "portion"}`` items (portion in grams), in a stable order."""
+    items = sorted((catalog.categories[i], catalog.names[i], round(float(p), 3)) for i, p in zip(ids, portions))
+    return [{"category": category, "food": food, "portion": portion} for category, food, portion in items]
+
+
+def canonical_json(items):
+    return json.dumps(items, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def share_id(foods):
+    """Id of a shared plan: a hash of its canonical JSON, so identical plans share one row."""
+    return hashlib.sha256(foods.encode("utf-8")).hexdigest()[:ID_LENGTH]
+
+
+def parse_foods(foods):
+    """Items of a stored plan.
+
+    Plans shared before content addressing hold DataFrame records with portions in
+    units of 100 g.
+    """
+    records = json.loads(foods)
+    if records and "protein" in records[0]:
+        return [{"category": r["category"], "food": r["food"], "portion": r["portion"] * 100} for r in records]
+    return records
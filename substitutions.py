@@ -0,0 +1,120 @@
+"""Food substitutions: nearest same-category foods that bring a plan back within its DRI checks."""
+
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+
+from nutrition import HIGH_FACTORS, LIMIT_FACTORS, LOW_FACTORS, dri_vector
+
+# The plan is flagged above these fractions of the DRI (warning or recommendation) and below LOW_FACTORS
+CEILING_FACTORS = np.fmin(LIMIT_FACTORS, HIGH_FACTORS)
+
+Swap = namedtuple("Swap", ["position", "food_id", "substitute_id", "portion", "totals"])
+
+
+def violation(totals, dri):
+    """How far ``totals`` (one vector or a stack of them) fall outside the DRI checks, as fractions of the DRI."""
+    limits = dri_vector(dri)
+    above = np.maximum(totals - limits * CEILING_FACTORS, 0) / limits
+    below = np.maximum(limits * LOW_FACTORS - totals, 0) / limits
+    # Unchecked nutrients have nan factors
+    return np.nansum(above, axis=-1) + np.nansum(below, axis=-1)
+
+
+class SubstitutionIndex:
+    """One KD-tree per category over nutrient vectors scaled by the DRI.
+
+    Trees are keyed by a fingerprint of their category's foods, so ``update`` with a
+    changed catalog only rebuilds the categories whose foods changed.
+    """
+
+    def __init__(self, catalog, dri):
+        self.scale = dri_vector(dri)
+        self._trees = {}
+        self.update(catalog)
+
+    @staticmethod
+    def _fingerprint(catalog, ids):
+        digest = hashlib.sha256()
+        digest.update("\0".join(catalog.names[i] for i in ids).encode("utf-8"))
+        digest.update(np.ascontiguousarray(catalog.nutrients[ids]).tobytes())
+        return digest.hexdigest()
+
+    def update(self, catalog):
+        """Point the index at ``catalog``; returns the number of category trees rebuilt."""
+        from scipy.spatial import cKDTree
+
+        trees = {}
+        rebuilt = 0
+        for category, ids in catalog.category_ids.items():
+            ids = np.asarray(ids, dtype=np.intp)
+            fingerprint = self._fingerprint(catalog, ids)
+            previous = self._trees.get(category)
+            if previous is not None and previous[0] == fingerprint:
+                # Same foods in the same order; only their ids may have moved
+                tree = previous[1]
+            else:
+                tree = cKDTree(catalog.nutrients[ids] / self.scale)
+                rebuilt += 1
+            trees[category] = (fingerprint, tree, ids)
+        self._trees = trees
+        self.catalog = catalog
+        return rebuilt
+
+    def neighbors(self, ids, k=10):
+        """The ``k`` most similar foods in the same category for each of ``ids``.
+
+        Returns an ``(len(ids), k)`` id array, nearest first, padded with -1.
+        """
+        ids = np.asarray(ids, dtype=np.intp)
+        result = np.full((len(ids), k), -1, dtype=np.intp)
+        categories = [self.catalog.categories[i] for i in ids.tolist()]
+        for category in set(categories):
+            _, tree, category_ids = self._trees[category]
+            rows = np.flatnonzero([c == category for c in categories])
+            # One extra neighbor since each food is its own nearest
+            n = min(k + 1, len(category_ids))
+            _, found = tree.query(self.catalog.nutrients[ids[rows]] / self.scale, k=n)
+            found = category_ids[np.asarray(found).reshape(len(rows), n)]
+            for row, candidates in zip(rows, found):
+                candidates = candidates[candidates != ids[row]][:k]
+                result[row, :len(candidates)] = candidates
+        return result
+
+    def suggest(self, ids, portions, dri, k=10, max_swaps=3):
+        """Greedy same-portion swaps that most reduce how far the plan is outside its DRI checks.
+
+        Each round takes the single swap that helps most, until the plan passes, no swap
+        helps or ``max_swaps`` is reached. Each selected item is swapped at most once.
+        """
+        ids = np.asarray(ids, dtype=np.intp)
+        portions = np.asarray(portions, dtype=np.float64) / 100
+        nutrients = self.catalog.nutrients
+        contributions = nutrients[ids] * portions[:, None]
+        totals = contributions.sum(axis=0)
+        current = violation(totals, dri)
+        if not len(ids) or current <= 0:
+            return []
+
+        candidates = self.neighbors(ids, k)
+        valid = candidates >= 0
+        # Plan totals after each candidate swap, shape (len(ids), k, len(NUTRIENTS))
+        delta = nutrients[candidates] * portions[:, None, None] - contributions[:, None, :]
+        swaps = []
+        while len(swaps) < max_swaps and current > 0:
+            scores = np.where(valid, violation(totals + delta, dri), np.inf)
+            position, column = np.unravel_index(np.argmin(scores), scores.shape)
+            if scores[position, column] >= current - 1e-9:
+                break
+            totals = totals + delta[position, column]
+            current = scores[position, column]
+            valid[position] = False
+            swaps.append(Swap(
+                position=int(position),
+                food_id=int(ids[position]),
+                substitute_id=int(candidates[position, column]),
+                portion=float(portions[position] * 100),
+                totals=totals,
+            ))
+        return swaps
@@ -0,0 +1,145 @@
+"""Streaming export and import of meal history as Parquet or CSV files.
+
+Both formats hold one HISTORY_COLUMNS row per logged food, so a file exported from one
+database can be imported into another. Rows move a batch at a time in both directions:
+exports read from a cursor, imports insert with executemany, and neither holds a whole
+history in memory.
+"""
+
+import csv
+import gzip
+import itertools
+import logging
+
+from catalog import NUTRIENTS
+from db import HISTORY_COLUMNS, ITEM_COLUMNS, insert_meal_logs, iter_meal_history, restore_daily_totals, snapshot_daily_totals
+
+logger = logging.getLogger(__name__)
+
+# History rows per cursor fetch and file batch on export, logs per transaction on import
+BATCH_SIZE = 10_000
+# Columns holding numbers; everything else is text
+NUMERIC_COLUMNS = frozenset(HISTORY_COLUMNS[3:7] + ITEM_COLUMNS[2:])
+FOOD_START = len(HISTORY_COLUMNS) - len(ITEM_COLUMNS)
+
+
+def file_format(path):
+    """``"parquet"`` or ``"csv"``, from the file name; CSV may be gzipped."""
+    name = path.lower()
+    if name.endswith((".parquet", ".pq")):
+        return "parquet"
+    if name.endswith((".csv", ".csv.gz")):
+        return "csv"
+    raise ValueError(f"Unknown history file format: {path} (expected .parquet, .csv or .csv.gz)")
+
+
+def _open_csv(path, mode):
+    if path.lower().endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def _parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        (col, pa.int64() if col == "log_id" else pa.float64() if col in NUMERIC_COLUMNS else pa.string())
+        for col in HISTORY_COLUMNS
+    ])
+
+
+def write_csv(path, batches):
+    count = 0
+    with _open_csv(path, "w") as f:
+        writer = csv.writer(f)
+        writer.writerow(HISTORY_COLUMNS)
+        for rows in batches:
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+
+def write_parquet(path, batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    count = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in batches:
+            # One row group per batch
+            columns = zip(*rows)
+            writer.write_batch(pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            count += len(rows)
+    return count
+
+
+def export_history(pool, path, user_id=None, start=None, end=None, batch_size=BATCH_SIZE):
+    """Write meal history (optionally one user's, between two ISO dates) to ``path``; returns the row count."""
+    write = write_parquet if file_format(path) == "parquet" else write_csv
+    with pool.connection() as conn:
+        return write(path, iter_meal_history(conn, user_id, start, end, batch_size))
+
+
+def read_csv(path):
+    """HISTORY_COLUMNS rows from a CSV file, with empty cells as None and numbers parsed."""
+    with _open_csv(path, "r") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        missing = set(HISTORY_COLUMNS) - set(header)
+        if missing:
+            raise ValueError(f"{path} is missing columns: {', '.join(sorted(missing))}")
+        positions = [header.index(col) for col in HISTORY_COLUMNS]
+        numeric = [col in NUMERIC_COLUMNS for col in HISTORY_COLUMNS]
+        for row in reader:
+            yield tuple(
+                None if row[n] == "" else float(row[n]) if is_number else row[n]
+                for n, is_number in zip(positions, numeric)
+            )
+
+
+def read_parquet(path, batch_size=BATCH_SIZE):
+    """HISTORY_COLUMNS rows from a Parquet file, read one record batch at a time."""
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=list(HISTORY_COLUMNS)):
+        yield from zip(*(column.to_pylist() for column in batch.columns))
+
+
+def history_logs(rows):
+    """Group history rows into ``(user_id, date, totals, items)`` logs for insert_meal_logs.
+
+    A log's rows must be contiguous, as they are in exported files; rows without a food
+    belong to a log with no foods.
+    """
+    for _, log_rows in itertools.groupby(rows, key=lambda row: row[0]):
+        first = next(log_rows)
+        items = [row[FOOD_START:] for row in itertools.chain((first,), log_rows) if row[FOOD_START + 1] is not None]
+        yield first[1], first[2], [value or 0.0 for value in first[3:3 + len(NUTRIENTS)]], items
+
+
+def import_history(pool, path, batch_size=BATCH_SIZE, restore=False):
+    """Append the logs in ``path`` to meal_logs, one transaction per ``batch_size`` logs; returns the log count.
+
+    Logs get new ids, so importing the same file twice logs its meals twice. With
+    ``restore``, days that already have a daily_totals row keep it unchanged: use it to
+    load an archive back into the database it was compacted from, whose rollup still
+    counts the archived logs.
+    """
+    rows = read_parquet(path, batch_size) if file_format(path) == "parquet" else read_csv(path)
+    logs = history_logs(rows)
+    count = 0
+    while batch := list(itertools.islice(logs, batch_size)):
+        with pool.connection() as conn:
+            if restore:
+                # Snapshot and insert under one write lock, so no other write lands in between
+                conn.execute("BEGIN IMMEDIATE")
+                kept = snapshot_daily_totals(conn, {(user_id, date) for user_id, date, _, _ in batch})
+            count += insert_meal_logs(conn, batch)
+            if restore:
+                restore_daily_totals(conn, kept)
+        logger.debug(f"Imported {count} logs from {path}")
+    return count
@@ -0,0 +1,116 @@
+"""Write-behind queue: one background thread applies database writes in grouped transactions."""
+
+import atexit
+import concurrent.futures
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+class WriteBehind:
+    """Queue writes from any thread; a single writer thread commits them in batches.
+
+    ``submit(func, *args)`` returns a Future resolved with ``func(conn, *args)`` once the
+    transaction holding it has committed, so a resolved Future is a durable write. Each
+    write runs under its own savepoint: one failing write is rolled back and reported
+    on its Future without affecting the rest of the batch. Pending writes are flushed
+    when the process exits.
+    """
+
+    def __init__(self, pool, max_batch=256, max_delay=0.05):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._conn = pool.dedicated()
+        # Batching amortizes the fsync, so acknowledged writes can afford full durability
+        self._conn.execute("PRAGMA synchronous = FULL")
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, func, *args):
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("write-behind queue is closed")
+            self._queue.put((future, func, args))
+        return future
+
+    def _next_batch(self):
+        """Block for the first write, then gather more for up to ``max_delay`` seconds."""
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                entry = self._queue.get(timeout=self.max_delay)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                # Finish this batch, then stop
+                self._queue.put(_STOP)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while (batch := self._next_batch()) is not None:
+            self._commit(batch)
+        self._conn.close()
+
+    def _commit(self, batch):
+        batch = [(future, func, args) for future, func, args in batch if future.set_running_or_notify_cancel()]
+        results = []
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for future, func, args in batch:
+                self._conn.execute("SAVEPOINT write")
+                try:
+                    results.append((future, func(self._conn, *args), None))
+                    self._conn.execute("RELEASE write")
+                except Exception as e:
+                    self._conn.execute("ROLLBACK TO write")
+                    self._conn.execute("RELEASE write")
+                    results.append((future, None, e))
+            self._conn.commit()
+        except Exception as e:
+            logger.error(f"Write-behind batch of {len(batch)} failed: {e}")
+            if self._conn.in_transaction:
+                self._conn.rollback()
+            for future, _, _ in batch:
+                future.set_exception(e)
+            return
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def close(self, timeout=30):
+        """Stop accepting writes and wait for the queued ones to commit."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+
+def shared_writer(pool):
+    """Start the process-wide writer for ``pool``, closing the one it replaces (if any)."""
+    global _shared
+    with _shared_lock:
+        previous, _shared = _shared, WriteBehind(pool)
+    if previous is not None:
+        previous.close()
+    return _shared